@@ -0,0 +1,123 @@
+"""Latency of concurrent requests on an event loop while a heavy module is
+imported lazily by one request.
+
+Usage: python benchmarks/async_latency.py
+"""
+
+import os
+import statistics
+import subprocess as sp
+import sys
+import tempfile
+from pathlib import Path
+
+modes = {
+    "import on the event loop": "loop",
+    "await resolve_async()": "resolve_async",
+    "warm_up_when_idle()": "idle",
+}
+
+heavy_module = """
+def _work():
+    total = 0
+    for i in range(4_000_000):
+        total += i % 7
+    return total
+
+value = _work()
+
+def compute():
+    return value
+"""
+
+handlers_module = """
+from lazy_imports_lite import resolve_async
+from heavy_pck.heavy import compute
+
+async def handle_loop():
+    return compute()
+
+async def handle_resolve_async():
+    await resolve_async("compute")
+    return compute()
+"""
+
+client = """
+import asyncio
+import sys
+import time
+
+from lazy_imports_lite import _loader
+from lazy_imports_lite import warm_up_when_idle
+
+_loader.enabled_packages.update({"heavy_pck", "app_pck"})
+sys.meta_path.insert(0, _loader.LazyLoader())
+
+from app_pck import handlers
+
+mode = sys.argv[1]
+latencies = []
+
+
+async def request(scheduled):
+    latencies.append(time.perf_counter() - scheduled)
+
+
+async def main():
+    loop = asyncio.get_running_loop()
+    if mode == "idle":
+        warm_up_when_idle()
+        # the service is idle after the startup
+        await asyncio.sleep(1.0)
+
+    handler = handlers.handle_loop if mode == "loop" else handlers.handle_resolve_async
+    tasks = []
+    start = time.perf_counter()
+    for i in range(1000):
+        scheduled = start + i * 0.001
+        await asyncio.sleep(max(0, scheduled - time.perf_counter()))
+        tasks.append(loop.create_task(request(scheduled)))
+        if i == 50:
+            tasks.append(loop.create_task(handler()))
+    await asyncio.gather(*tasks)
+
+
+asyncio.run(main())
+print(" ".join(str(latency) for latency in latencies))
+"""
+
+
+def write_packages(path):
+    (path / "heavy_pck").mkdir()
+    (path / "heavy_pck" / "__init__.py").write_text("")
+    (path / "heavy_pck" / "heavy.py").write_text(heavy_module)
+    (path / "app_pck").mkdir()
+    (path / "app_pck" / "__init__.py").write_text("")
+    (path / "app_pck" / "handlers.py").write_text(handlers_module)
+    (path / "client.py").write_text(client)
+
+
+def run(path, mode):
+    result = sp.run(
+        [sys.executable, "-B", str(path / "client.py"), mode],
+        cwd=str(path),
+        env={**os.environ, "PYTHONPATH": str(path)},
+        capture_output=True,
+        check=True,
+    )
+    return sorted(float(latency) for latency in result.stdout.split())
+
+
+with tempfile.TemporaryDirectory() as d:
+    path = Path(d)
+    write_packages(path)
+
+    print("latency of 1000 requests (1 per ms), one request imports a heavy module")
+    for title, mode in modes.items():
+        latencies = run(path, mode)
+        p50 = statistics.median(latencies)
+        p99 = latencies[int(len(latencies) * 0.99)]
+        print(
+            f"  {title:26} p50 {p50*1e3:6.2f} ms  p99 {p99*1e3:7.2f} ms"
+            f"  max {latencies[-1]*1e3:7.2f} ms"
+        )
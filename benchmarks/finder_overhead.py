@@ -0,0 +1,84 @@
+"""Overhead of the LazyLoader for imports of packages which are not enabled.
+
+Usage: python benchmarks/finder_overhead.py
+"""
+
+import os
+import pkgutil
+import site
+import statistics
+import subprocess as sp
+import sys
+import timeit
+from importlib.machinery import PathFinder
+
+from lazy_imports_lite._loader import LazyLoader
+
+skip = {"antigravity", "this", "idlelib", "tkinter", "turtle", "turtledemo"}
+
+
+def stdlib_modules():
+    names = getattr(sys, "stdlib_module_names", sys.builtin_module_names)
+    return sorted(n for n in names if not n.startswith("_") and n not in skip)
+
+
+def third_party_modules():
+    return sorted(
+        {
+            m.name
+            for m in pkgutil.iter_modules(site.getsitepackages())
+            if not m.name.startswith("_") and m.name != "lazy_imports_lite"
+        }
+    )
+
+
+import_script = """
+import sys, time
+names = sys.argv[1:]
+start = time.perf_counter()
+for name in names:
+    try:
+        __import__(name)
+    except BaseException:
+        pass
+print(time.perf_counter() - start)
+"""
+
+
+def import_time(names, disabled):
+    env = dict(os.environ)
+    if disabled:
+        env["LAZY_IMPORTS_LITE_DISABLE"] = "1"
+    else:
+        env.pop("LAZY_IMPORTS_LITE_DISABLE", None)
+
+    times = []
+    for _ in range(5):
+        result = sp.run(
+            [sys.executable, "-c", import_script, *names],
+            env=env,
+            capture_output=True,
+            check=True,
+        )
+        times.append(float(result.stdout))
+    return statistics.median(times)
+
+
+def find_spec_time(finder, names):
+    def find_all():
+        for name in names:
+            finder.find_spec(name)
+
+    return min(timeit.repeat(find_all, number=1, repeat=5)) / len(names)
+
+
+names = stdlib_modules() + third_party_modules()
+print(f"{len(names)} modules")
+
+print("find_spec() per module:")
+print(f"  {'PathFinder':>25} {find_spec_time(PathFinder, names)*1e6:8.2f} us")
+print(f"  {'LazyLoader':>25} {find_spec_time(LazyLoader(), names)*1e6:8.2f} us")
+
+print("import all modules:")
+print(f"  {'without finder':>25} {import_time(names, True)*1e3:8.1f} ms")
+print(f"  {'with finder':>25} {import_time(names, False)*1e3:8.1f} ms")
@@ -0,0 +1,82 @@
+"""Memory and latency of the lazy imports of a package with thousands of
+imports.
+
+Usage: python benchmarks/import_registry.py [modules] [imports per module]
+"""
+
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from lazy_imports_lite import _hooks
+from lazy_imports_lite import _loader
+
+modules = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+imports = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+targets = 10
+
+
+def write_package(path):
+    package = path / "registry_pck"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+
+    sub = package / "sub"
+    sub.mkdir()
+    (sub / "__init__.py").write_text("")
+    for t in range(targets):
+        names = "\n".join(f"name{i} = {i}" for i in range(imports))
+        (package / f"target{t}.py").write_text(names + "\n")
+        (sub / f"s{t}.py").write_text("")
+
+    for m in range(modules):
+        lines = []
+        for i in range(imports):
+            lines.append(f"from .target{(m + i) % targets} import name{i} as n{i}")
+            lines.append(f"import registry_pck.sub.s{(m + i) % targets}")
+        lines.append("def use_all():")
+        lines.append(f"    return [{', '.join(f'n{i}' for i in range(imports))}]")
+        lines.append("def use_package():")
+        lines.append("    return registry_pck.sub")
+        (package / f"m{m}.py").write_text("\n".join(lines) + "\n")
+
+
+def registry_size():
+    """Number of entries in the registry of the unresolved imports."""
+    registry = getattr(_hooks, "registry", None)
+    if registry is None:
+        # the implementation without the registry
+        return sum(len(v) for v in _hooks.pending_imports.values())
+    return sum(len(v) for v in registry.from_imports.values())
+
+
+with tempfile.TemporaryDirectory() as d:
+    write_package(Path(d))
+    sys.path.insert(0, d)
+    _loader.enabled_packages.add("registry_pck")
+    sys.meta_path.insert(0, _loader.LazyLoader())
+
+    import registry_pck  # noqa
+
+    # transform and cache the modules before the measurement
+    for m in range(modules):
+        _loader.get_code(str(Path(d) / "registry_pck" / f"m{m}.py"))
+
+    tracemalloc.start()
+    loaded = [__import__(f"registry_pck.m{m}", fromlist=["*"]) for m in range(modules)]
+    load_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    size_before = registry_size()
+
+    start = time.perf_counter()
+    for module in loaded:
+        module.use_all()
+        module.use_package()
+    resolve_time = time.perf_counter() - start
+
+    print(f"{modules} modules with {imports*2} imports each")
+    print(f"  memory of the loaded modules: {load_memory/1024:8.0f} KiB")
+    print(f"  resolve all imports:          {resolve_time*1e3:8.1f} ms")
+    print(f"  registry entries: {size_before} -> {registry_size()}")
@@ -0,0 +1,59 @@
+"""Attribute access on a transformed module compared to a normal module.
+
+Usage: python benchmarks/module_attribute.py
+"""
+
+import subprocess as sp
+import sys
+import tempfile
+from pathlib import Path
+
+module = """
+from collections import namedtuple
+
+def function():
+    pass
+
+constant = 5
+"""
+
+enable = """
+import lazy_imports_lite._loader as loader
+loader.enabled_packages.add("bench_pck")
+sys.meta_path.insert(0, loader.LazyLoader())
+"""
+
+script = """
+import timeit
+import bench_pck
+
+for name in ("namedtuple", "function", "constant"):
+    t = min(timeit.repeat(f"bench_pck.{name}", globals=globals(), repeat=5))
+    print(f"  {name:>20} {t*1e3:8.1f} ns")
+print(f"  {'module type':>20} {type(bench_pck).__name__}")
+"""
+
+
+def run(lazy):
+    with tempfile.TemporaryDirectory() as d:
+        (Path(d) / "bench_pck").mkdir()
+        (Path(d) / "bench_pck" / "__init__.py").write_text(module)
+
+        code = f"import sys\nsys.path.insert(0, {d!r})\n"
+        if lazy:
+            code += enable
+        code += script
+
+        result = sp.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            check=True,
+            env={"LAZY_IMPORTS_LITE_DISABLE": "1"},
+        )
+        print(result.stdout.decode(), end="")
+
+
+print("normal module:")
+run(False)
+print("transformed module:")
+run(True)
@@ -0,0 +1,72 @@
+"""Import time of modules which wait for I/O during their import, one after
+the other and with prefetch().
+
+time.sleep() stands in for the blocking parts of an import (slow file
+systems, decompression, GIL releasing extension initialization).
+
+Usage: python benchmarks/prefetch.py [modules] [ms per module]
+"""
+
+import os
+import subprocess as sp
+import sys
+import tempfile
+from pathlib import Path
+
+modules = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+delay = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+
+client = """
+import sys
+import time
+
+from lazy_imports_lite import _loader
+from lazy_imports_lite import prefetch
+
+_loader.enabled_packages.add("io_pck")
+sys.meta_path.insert(0, _loader.LazyLoader())
+
+import io_pck
+
+names = [f"io_pck.m{i}" for i in range(int(sys.argv[2]))]
+
+start = time.perf_counter()
+if sys.argv[1] == "sequential":
+    for name in names:
+        __import__(name)
+else:
+    prefetch(names, workers=int(sys.argv[1]))
+print(time.perf_counter() - start)
+"""
+
+
+def write_package(path):
+    package = path / "io_pck"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    for i in range(modules):
+        (package / f"m{i}.py").write_text(f"import time\ntime.sleep({delay})\n")
+    (path / "client.py").write_text(client)
+
+
+def run(path, mode):
+    result = sp.run(
+        [sys.executable, "-B", str(path / "client.py"), mode, str(modules)],
+        cwd=str(path),
+        env={**os.environ, "PYTHONPATH": str(path)},
+        capture_output=True,
+        check=True,
+    )
+    return float(result.stdout)
+
+
+with tempfile.TemporaryDirectory() as d:
+    path = Path(d)
+    write_package(path)
+
+    print(f"{modules} modules which block for {delay*1e3:.0f} ms during the import")
+    print(f"  sequential imports:     {run(path, 'sequential')*1e3:8.1f} ms")
+    for workers in (4, 16):
+        print(
+            f"  prefetch(workers={workers:2}):   {run(path, str(workers))*1e3:8.1f} ms"
+        )
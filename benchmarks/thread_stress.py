@@ -0,0 +1,89 @@
+"""Many threads which use the same lazy imports for the first time.
+
+Checks that every thread gets the same objects and measures the contention
+on the first use. Run it with a free-threaded build (python3.13t) to check
+the behaviour without the GIL.
+
+Usage: python benchmarks/thread_stress.py [threads] [modules]
+"""
+
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from collections import Counter
+from pathlib import Path
+
+from lazy_imports_lite import _hooks
+from lazy_imports_lite import _loader
+
+threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+modules = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+
+def write_package(path):
+    package = path / "stress_pck"
+    package.mkdir()
+    lines = []
+    for i in range(modules):
+        (package / f"m{i}.py").write_text("value = object()\n")
+        lines.append(f"from .m{i} import value as v{i}")
+        lines.append(f"import stress_pck.m{i}")
+    lines.append("def use_all():")
+    lines.append(f"    return [{', '.join(f'v{i}' for i in range(modules))}]")
+    (package / "__init__.py").write_text("\n".join(lines) + "\n")
+
+
+imports = Counter()
+safe_import = _hooks.safe_import
+
+
+def counting_safe_import(module, package=None):
+    imports[(module, package)] += 1
+    return safe_import(module, package)
+
+
+_hooks.safe_import = counting_safe_import
+
+with tempfile.TemporaryDirectory() as d:
+    write_package(Path(d))
+    sys.path.insert(0, d)
+    _loader.enabled_packages.add("stress_pck")
+    sys.meta_path.insert(0, _loader.LazyLoader())
+
+    import stress_pck
+
+    barrier = threading.Barrier(threads)
+    results = [None] * threads
+    times = [0.0] * threads
+    errors = []
+
+    def worker(n):
+        try:
+            barrier.wait()
+            start = time.perf_counter()
+            values = stress_pck.use_all()
+            values += [getattr(stress_pck, f"v{i}") for i in range(modules)]
+            times[n] = time.perf_counter() - start
+            results[n] = [id(v) for v in values]
+        except BaseException as e:  # pragma: no cover
+            errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+print(f"{threads} threads, {modules} modules, GIL {'enabled' if gil else 'disabled'}")
+print(f"errors: {len(errors)}")
+print(f"consistent results: {all(r == results[0] for r in results)}")
+print(f"first use: max {max(times)*1e3:.1f} ms, min {min(times)*1e3:.1f} ms")
+print(
+    f"safe_import() calls: {sum(imports.values())} "
+    f"for {len(imports)} imports (duplicates are resolved by importlib)"
+)
+fast_path = min(timeit.repeat(stress_pck.use_all, number=10000, repeat=3)) / 10000
+print(f"resolved fast path: {fast_path*1e6:.2f} us per call")
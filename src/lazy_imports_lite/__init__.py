@@ -1,3 +1,40 @@
-from contextlib import nullcontext as eager_imports
-
+from ._hooks import eager_imports
+from ._hooks import lazy_imports
 from ._hooks import LazyImportError
+
+# The package is imported at startup by the loader (lazy_imports_lite._loader).
+# The other modules are only imported when their functions are used.
+_exports = {
+    "prefetch": "_prefetch",
+    "resolve_all": "_resolve",
+    "resolve_async": "_async",
+    "stats": "_stats",
+    "warm_up": "_profile",
+    "warm_up_when_idle": "_async",
+}
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from ._async import resolve_async
+    from ._async import warm_up_when_idle
+    from ._prefetch import prefetch
+    from ._profile import warm_up
+    from ._resolve import resolve_all
+    from ._stats import stats
+
+
+def __getattr__(name):
+    try:
+        module = _exports[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_exports})
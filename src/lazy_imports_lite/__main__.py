@@ -1,12 +1,234 @@
 import argparse
 import ast
+import importlib.machinery
+import importlib.util
+import marshal
+import os
 import pathlib
+import runpy
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
+from lazy_imports_lite._archive import write_archive
+from lazy_imports_lite._config import default_config
+from lazy_imports_lite._config import distribution_config
+from lazy_imports_lite._config import is_included
+from lazy_imports_lite._loader import _top_level_declared
+from lazy_imports_lite._loader import _top_level_inferred
+from lazy_imports_lite._loader import enabled_distributions
+from lazy_imports_lite._loader import get_code
+from lazy_imports_lite._loader import run_main
+from lazy_imports_lite._loader import setup
+from lazy_imports_lite._loader import transform_file
+from lazy_imports_lite._loader import write_registry
+from lazy_imports_lite._transformer import transformer_options
 from lazy_imports_lite._transformer import TransformModuleImports
 from lazy_imports_lite._utils import unparse
 
 
+def _installed_files(dist):
+    for file in dist.files or []:
+        if (
+            file.parts[0] == ".."
+            or file.parts[0].endswith(".dist-info")
+            or "__pycache__" in file.parts
+        ):
+            continue
+        yield file
+
+
+def package_config(dist):
+    return distribution_config(dist)[0] or default_config
+
+
+def distribution_files():
+    """Yields (file, configuration, package of the module) for every file of
+    the enabled distributions."""
+    for dist in enabled_distributions():
+        config = package_config(dist)
+        for file in _installed_files(dist):
+            yield str(dist.locate_file(file)), config, ".".join(file.parts[:-1])
+
+
+def distribution_packages():
+    """Yields (package directory, RECORD file, files, configuration) for every
+    package of the enabled distributions."""
+    for dist in enabled_distributions():
+        record = next(
+            (
+                file
+                for file in dist.files or []
+                if file.name == "RECORD" and file.parts[0].endswith(".dist-info")
+            ),
+            None,
+        )
+        if record is None:
+            continue  # pragma: no cover
+
+        files = list(_installed_files(dist))
+        config = package_config(dist)
+        for package in _top_level_declared(dist) or _top_level_inferred(dist):
+            parts = tuple(package.split("."))
+            package_files = [
+                str(dist.locate_file(file))
+                for file in files
+                if file.parts[: len(parts)] == parts and len(file.parts) > len(parts)
+            ]
+            if package_files:
+                yield (
+                    str(dist.locate_file("/".join(parts))),
+                    str(dist.locate_file(record)),
+                    package_files,
+                    config,
+                )
+
+
+def directory_files(path):
+    if os.path.isfile(path):
+        yield path
+        return
+
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for file in sorted(files):
+            yield os.path.join(root, file)
+
+
+def compile_file(filename, archive=False, config=default_config, package=None):
+    if package is not None:
+        # `package` is used to resolve relative imports, like in find_spec()
+        name = os.path.splitext(os.path.basename(filename))[0]
+        if name != "__init__":
+            name = f"{package}.{name}" if package else name
+        else:
+            name = package
+        if not is_included(name, config):
+            return filename, "excluded by the configuration", None, None
+
+    # the cache is always written, like `python -m compileall` does
+    sys.dont_write_bytecode = False
+    try:
+        if archive:
+            result = transform_file(filename, transformer_options(), config[2], package)
+        else:
+            result = get_code(filename, config[2], package)
+    except (SyntaxError, ValueError, OSError) as e:
+        return filename, None, f"{type(e).__name__}: {e}", None
+
+    reason = result if isinstance(result, str) else None
+    return filename, reason, None, marshal.dumps(result) if archive else None
+
+
+def compile_modules(paths, workers, quiet, archive=False):
+    if paths:
+        files = [
+            (file, default_config, None)
+            for path in paths
+            for file in directory_files(path)
+        ]
+    else:
+        # the next interpreter start does not have to scan the distributions
+        write_registry()
+        files = distribution_files()
+
+    # a distribution can be found multiple times if sys.path contains duplicates
+    files = list(dict.fromkeys(files))
+
+    packages = list(distribution_packages()) if archive else []
+    archived_files = {
+        file for _, _, package_files, _ in packages for file in package_files
+    }
+
+    module_suffixes = tuple(importlib.machinery.all_suffixes())
+
+    sources = []
+    skipped = []
+    for file, config, package in files:
+        if file.endswith(".py"):
+            sources.append((file, config, package))
+        elif file.endswith(module_suffixes):
+            skipped.append((file, "not a .py file"))
+
+    errors = []
+    compiled = 0
+    archive_data = {}
+    with ProcessPoolExecutor(workers) as executor:
+        for filename, reason, error, data in executor.map(
+            compile_file,
+            [file for file, _, _ in sources],
+            [file in archived_files for file, _, _ in sources],
+            [config for _, config, _ in sources],
+            [package for _, _, package in sources],
+            chunksize=16,
+        ):
+            if error is not None:
+                errors.append((filename, error))
+                continue
+
+            if data is not None:
+                archive_data[filename] = data
+
+            if reason is not None:
+                skipped.append((filename, reason))
+            else:
+                compiled += 1
+
+    if not quiet:
+        for filename, reason in sorted(skipped):
+            print(f"skipped {filename}: {reason}")
+    for filename, error in sorted(errors):
+        print(f"error {filename}: {error}", file=sys.stderr)
+
+    for package_dir, record, package_files, config in packages:
+        modules = {
+            os.path.relpath(file, package_dir).replace(os.sep, "/"): archive_data[file]
+            for file in package_files
+            if file in archive_data
+        }
+        if modules:
+            path = write_archive(package_dir, record, modules, config[2])
+            if not quiet:
+                print(f"archive {path}: {len(modules)} modules")
+
+    print(f"compiled {compiled} modules, skipped {len(skipped)}, errors {len(errors)}")
+
+    return 1 if errors else 0
+
+
+def run(target, args, module=False, packages=()):
+    if packages:
+        # the packages are also enabled in subprocesses
+        names = [os.environ.get("LAZY_IMPORTS_LITE_PACKAGES", ""), *packages]
+        os.environ["LAZY_IMPORTS_LITE_PACKAGES"] = ",".join(filter(None, names))
+    setup()
+
+    disabled = "LAZY_IMPORTS_LITE_DISABLE" in os.environ
+
+    if module:
+        sys.path[0] = os.getcwd()
+        spec = importlib.util.find_spec(target)
+        if spec is not None and spec.submodule_search_locations is not None:
+            spec = importlib.util.find_spec(f"{target}.__main__")
+        if spec is None:
+            print(f"Error: No module named {target}", file=sys.stderr)
+            exit(1)
+
+        sys.argv = [spec.origin, *args]
+        if disabled or spec.origin is None or not spec.origin.endswith(".py"):
+            runpy.run_module(spec.name, run_name="__main__", alter_sys=True)
+        else:
+            run_main(spec.origin, spec)
+
+    else:
+        sys.path[0] = os.path.dirname(os.path.abspath(target))
+        sys.argv = [target, *args]
+        if disabled or not os.path.isfile(target):
+            # directories and zip files
+            runpy.run_path(target, run_name="__main__")
+        else:
+            run_main(target)
+
+
 def main():
     parser = argparse.ArgumentParser(
         prog="lazy-imports-lite", description="Tool for various file operations."
@@ -20,17 +242,102 @@ def main():
         "preview", help="Preview the contents of a file"
     )
     preview_parser.add_argument("filename", help="Name of the file to preview")
+    preview_parser.add_argument(
+        "--hoist-loops",
+        action="store_true",
+        help="Resolve imported names which are used in loops only once per call",
+    )
+    preview_parser.add_argument(
+        "--hoist-function-imports",
+        action="store_true",
+        help="Resolve the imports inside of functions only once",
+    )
+    preview_parser.add_argument(
+        "--probe-imports",
+        action="store_true",
+        help="Decide `try: import ... except ImportError:` with a spec lookup",
+    )
+    preview_parser.add_argument(
+        "--count-lazy-loads",
+        action="store_true",
+        help="Count the executed lazy references (LAZY_IMPORTS_LITE_INSTRUMENT)",
+    )
+
+    # Subcommand for compile
+    compile_parser = subparsers.add_parser(
+        "compile",
+        help="Transform modules ahead of time and store them in the cache",
+    )
+    compile_parser.add_argument(
+        "paths",
+        nargs="*",
+        help="Files or directories to compile (default: all enabled distributions)",
+    )
+    compile_parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of processors)",
+    )
+    compile_parser.add_argument(
+        "-q", "--quiet", action="store_true", help="Do not list skipped modules"
+    )
+    compile_parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="Store the modules of every enabled package in one memory-mapped archive",
+    )
+
+    # Subcommand for run
+    run_parser = subparsers.add_parser(
+        "run", help="Run a script or module with lazy imports"
+    )
+    run_parser.add_argument(
+        "-p",
+        "--package",
+        action="append",
+        default=[],
+        help="Enable lazy imports for this top-level package (can be repeated)",
+    )
+    run_parser.add_argument(
+        "-m",
+        dest="module",
+        action="store_true",
+        help="Run the target as module (like `python -m`)",
+    )
+    run_parser.add_argument("target", help="Script or module to run")
+    run_parser.add_argument(
+        "args", nargs=argparse.REMAINDER, help="Arguments for the target"
+    )
 
     args = parser.parse_args()
 
     if args.subcommand == "preview":
-        transformer = TransformModuleImports()
+        options = dict.fromkeys(transformer_options(), True)
+        if args.hoist_loops:
+            options["hoist_loops"] = True
+        if args.hoist_function_imports:
+            options["hoist_function_imports"] = True
+        if args.probe_imports:
+            options["probe_imports"] = True
+        if args.count_lazy_loads:
+            options["count_lazy_loads"] = True
+        transformer = TransformModuleImports(**options)
         code = pathlib.Path(args.filename).read_text()
         tree = ast.parse(code)
         new_tree = ast.fix_missing_locations(transformer.visit(tree))
         new_code = unparse(new_tree)
         print(new_code)
 
+    elif args.subcommand == "compile":
+        if args.archive and args.paths:
+            compile_parser.error("--archive can only be used for distributions")
+        exit(compile_modules(args.paths, args.workers, args.quiet, args.archive))
+
+    elif args.subcommand == "run":
+        run(args.target, args.args, args.module, args.package)
+
     else:
         print(
             "Error: Please specify a valid subcommand. Use 'preview --help' for more information.",
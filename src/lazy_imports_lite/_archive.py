@@ -0,0 +1,130 @@
+import importlib.util
+import marshal
+import mmap
+import os
+import struct
+import sys
+
+from ._cache import file_key
+from ._cache import write_file
+from ._transformer import TRANSFORMER_VERSION
+from ._transformer import transformer_options
+
+# Layout of an archive:
+#
+#   MAGIC_NUMBER | len(index) as "<Q" | marshal(index) | data
+#
+# index is (key, manifest, entries)
+#   key: (layout version, TRANSFORMER_VERSION, sys.flags.optimize,
+#         transformer options, eager modules of the configuration)
+#   manifest: (path of the RECORD file of the distribution, mtime_ns, size)
+#   entries: {path relative to the package directory:
+#             (offset, length, (mtime_ns, size) of the source file)}
+#
+# The data of every entry is a marshalled code object or the reason why the
+# module can not be transformed (like the per module cache). An entry is not
+# used if its source file was edited after the archive was written.
+
+_header = struct.Struct("<Q")
+
+
+def archive_path(package_dir):
+    return os.path.join(
+        package_dir,
+        "__pycache__",
+        f"__lazy_imports_lite__.{sys.implementation.cache_tag}.archive",
+    )
+
+
+def archive_key(eager_modules=()):
+    return (
+        2,  # the version of the archive layout
+        TRANSFORMER_VERSION,
+        sys.flags.optimize,
+        transformer_options(),
+        tuple(eager_modules),
+    )
+
+
+def manifest(record):
+    stat = os.stat(record)
+    return (record, stat.st_mtime_ns, stat.st_size)
+
+
+def write_archive(package_dir, record, modules, eager_modules=()):
+    """Writes the archive for all `modules` ({relative path: marshalled
+    result}) of the package in `package_dir`."""
+    entries = {}
+    data = []
+    offset = 0
+    for name, module_data in sorted(modules.items()):
+        source = file_key(os.path.join(package_dir, name))
+        entries[name] = (offset, len(module_data), source)
+        data.append(module_data)
+        offset += len(module_data)
+
+    index = marshal.dumps((archive_key(eager_modules), manifest(record), entries))
+
+    path = archive_path(package_dir)
+    write_file(
+        path,
+        b"".join([importlib.util.MAGIC_NUMBER, _header.pack(len(index)), index, *data]),
+    )
+    return path
+
+
+class Archive:
+    def __init__(self, map, entries, data_offset, package_dir):
+        self.map = map
+        self.entries = entries
+        self.data_offset = data_offset
+        self.package_dir = package_dir
+
+    def get(self, name):
+        """Returns the code (or reason) for the module at the relative path
+        `name` or None if the module is not part of the archive or if its
+        source was edited."""
+        try:
+            offset, length, source = self.entries[name]
+        except KeyError:
+            return None
+        if file_key(os.path.join(self.package_dir, name)) != source:
+            return None
+        start = self.data_offset + offset
+        return marshal.loads(self.map[start : start + length])
+
+
+def open_archive(package_dir, eager_modules=()):
+    """Maps the archive of the package into memory.
+
+    Returns None if there is no archive or if it is outdated.
+    """
+    try:
+        with open(archive_path(package_dir), "rb") as f:
+            map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        magic_end = len(importlib.util.MAGIC_NUMBER)
+        index_start = magic_end + _header.size
+
+        if map[:magic_end] != importlib.util.MAGIC_NUMBER:
+            raise ValueError("wrong magic number")
+
+        (index_length,) = _header.unpack(map[magic_end:index_start])
+        data_offset = index_start + index_length
+        key, archive_manifest, entries = marshal.loads(map[index_start:data_offset])
+
+        if key != archive_key(eager_modules):
+            raise ValueError("archive of a different version")
+
+        # the distribution was reinstalled if the RECORD file changed
+        if manifest(archive_manifest[0]) != archive_manifest:
+            raise ValueError("outdated archive")
+
+    except (OSError, ValueError, EOFError, TypeError, struct.error):
+        map.close()
+        return None
+
+    return Archive(map, entries, data_offset, package_dir)
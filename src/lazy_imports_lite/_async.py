@@ -0,0 +1,92 @@
+import sys
+
+from ._hooks import is_resolved
+from ._hooks import LazyImportError
+from ._hooks import LazyObject
+from ._hooks import pending_objects
+from ._hooks import resolve_import
+
+# asyncio is imported by the functions, this module is imported at startup
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import asyncio
+    from typing import Set
+
+
+def resolve_async(*names):
+    """Resolves the lazy imports `names` of the calling module in a worker
+    thread, which does not block the event loop (`await resolve_async("np")`).
+    """
+    module_globals = sys._getframe(1).f_globals
+    objects = []
+    for name in names:
+        try:
+            objects.append(module_globals[name])
+        except KeyError:
+            raise NameError(f"name {name!r} is not defined") from None
+    return resolve_objects(objects)
+
+
+async def resolve_objects(objects):
+    import asyncio
+
+    pending = [
+        obj for obj in objects if isinstance(obj, LazyObject) and not is_resolved(obj)
+    ]
+    if pending:
+        await asyncio.get_running_loop().run_in_executor(None, resolve_imports, pending)
+
+
+def resolve_imports(objects):
+    for obj in objects:
+        resolve_import(obj)
+
+
+# keeps the running warm-up tasks alive
+warm_up_tasks: "Set[asyncio.Task]" = set()
+
+
+def warm_up_when_idle(interval=0.05, max_lag=0.005):
+    """Starts a task which resolves the pending lazy imports of all modules in
+    a worker thread while the running event loop is idle.
+
+    The loop is idle if a sleep of `interval` seconds is not delayed more than
+    `max_lag` seconds. Returns the task.
+    """
+    import asyncio
+
+    task = asyncio.get_running_loop().create_task(warm_up_pending(interval, max_lag))
+    warm_up_tasks.add(task)
+    task.add_done_callback(warm_up_tasks.discard)
+    return task
+
+
+async def warm_up_pending(interval, max_lag):
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    done = set()
+    while True:
+        # the imported modules can contain new lazy objects
+        objects = [obj for obj in pending_objects() if obj not in done]
+        if not objects:
+            return
+
+        for obj in objects:
+            done.add(obj)
+            await wait_idle(loop, interval, max_lag)
+            try:
+                await loop.run_in_executor(None, resolve_import, obj)
+            except (Exception, LazyImportError):
+                # the error is raised again when the import is used
+                pass
+
+
+async def wait_idle(loop, interval, max_lag):
+    import asyncio
+
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        if loop.time() - start - interval <= max_lag:
+            return
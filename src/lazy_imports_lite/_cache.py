@@ -0,0 +1,109 @@
+import _imp
+import importlib.util
+import marshal
+import os
+import sys
+
+from ._transformer import TRANSFORMER_VERSION
+
+
+def cache_path(origin):
+    """Path of the file which caches the transformed code of `origin`.
+
+    The file lives next to the normal bytecode in `__pycache__` (or below
+    `sys.pycache_prefix`) and contains the interpreter tag and the optimization
+    level in its name, like the bytecode written by importlib.
+    """
+    try:
+        pyc = importlib.util.cache_from_source(origin)
+    except NotImplementedError:  # pragma: no cover
+        # sys.implementation.cache_tag is None
+        return None
+    return pyc[: -len(".pyc")] + ".lazy-imports-lite.pyc"
+
+
+def cache_key(source_stat, options=(), eager_modules=(), package=None):
+    return (
+        TRANSFORMER_VERSION,
+        tuple(options),
+        (tuple(eager_modules), package) if eager_modules else (),
+        source_stat.st_mtime_ns,
+        source_stat.st_size,
+    )
+
+
+def file_key(path):
+    """(mtime, size) of the file at `path` or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def read_cache(path, key):
+    """Returns the cached code (or the reason why the module was not
+    transformed) or None if there is no valid cache entry."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    if data[:4] != importlib.util.MAGIC_NUMBER:
+        return None
+
+    try:
+        cached_key, result = marshal.loads(data[4:])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+    if cached_key != key:
+        return None
+
+    return result
+
+
+def fix_filename(result, origin):
+    """Points the cached code objects to `origin`, like importlib does for
+    bytecode of a tree which was copied or moved."""
+    if isinstance(result, tuple):
+        for code in result[:2]:
+            _imp._fix_co_filename(code, origin)
+    return result
+
+
+def write_cache(path, key, result):
+    """Writes `result` to `path` (see write_file)."""
+    if sys.dont_write_bytecode:
+        return
+
+    write_entry(path, key, result)
+
+
+def write_entry(path, key, result):
+    """Writes `result` to `path` even if `sys.dont_write_bytecode` is set."""
+    write_file(path, importlib.util.MAGIC_NUMBER + marshal.dumps((key, result)))
+
+
+def write_file(path, data):
+    """Writes `data` atomically to `path`.
+
+    Concurrent writers use different temporary files and the last
+    `os.replace()` wins. Readers see either no file, an old file or a complete
+    new file. Errors are ignored because the cache is only an optimization (the
+    directory might be read-only).
+    """
+    tmp_path = f"{path}.{os.getpid()}.{id(data)}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+        try:
+            with open(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        pass
@@ -0,0 +1,168 @@
+import os
+import sys
+
+# Layout of the configuration in the pyproject.toml of a project:
+#
+#   [tool.lazy-imports-lite]
+#   include = ["*"]   # modules which are transformed
+#   exclude = []      # modules which are imported like without lazy imports
+#   eager = []        # imported modules which are never deferred
+#
+# The pyproject.toml is only found for distributions which are installed from
+# a local directory. The same options can be shipped with the distribution as
+# keywords in its metadata:
+#
+#   [project]
+#   keywords = ["lazy-imports-lite-enabled", "lazy-imports-lite-eager=pkg.x"]
+#
+# A pattern matches a module if it matches the name of the module or the name
+# of one of its parent packages (fnmatch syntax).
+#
+# The configuration is stored as (include, exclude, eager) tuple.
+
+default_config = (("*",), (), ())
+
+
+def matches(name, patterns):
+    # fnmatch imports re, which is not needed for the default configuration
+    if not patterns:
+        return False
+    if "*" in patterns:
+        return bool(name)
+
+    import fnmatch
+
+    while name:
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns):
+            return True
+        name = name.rpartition(".")[0]
+    return False
+
+
+def is_included(fullname, config):
+    include, exclude, _ = config
+    return matches(fullname, include) and not matches(fullname, exclude)
+
+
+def load_toml(path):
+    if sys.version_info >= (3, 11):
+        import tomllib
+    else:  # pragma: no cover
+        try:
+            import tomli as tomllib
+        except ImportError:
+            # the configuration is ignored without a toml parser
+            return {}
+
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def project_dir(dist):
+    """The source directory of a distribution which was installed from a local
+    directory (PEP 610) or None."""
+    import json
+    import urllib.parse
+    import urllib.request
+
+    try:
+        direct_url = json.loads(dist.read_text("direct_url.json") or "null")
+    except ValueError:
+        return None
+
+    if not isinstance(direct_url, dict):
+        return None
+
+    url = urllib.parse.urlparse(direct_url.get("url", ""))
+    if url.scheme != "file":
+        return None
+
+    path = urllib.request.url2pathname(url.path)
+    return os.path.join(path, direct_url.get("subdirectory", ""))
+
+
+def pyproject_path(dist):
+    directory = project_dir(dist)
+    if directory is None:
+        return None
+    path = os.path.join(directory, "pyproject.toml")
+    return path if os.path.isfile(path) else None
+
+
+def warn(message):
+    import warnings
+
+    warnings.warn(f"lazy-imports-lite: {message}", stacklevel=2)
+
+
+def read_config(path):
+    """The configuration of the project with the pyproject.toml at `path` or
+    None if it has no [tool.lazy-imports-lite] table."""
+    try:
+        pyproject = load_toml(path)
+    except (OSError, ValueError) as e:
+        warn(f"can not read the configuration in {path}: {e}")
+        return None
+
+    table = pyproject.get("tool", {}).get("lazy-imports-lite")
+    if table is None:
+        return None
+
+    def patterns(key, default):
+        value = table.get(key, default)
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, (list, tuple)) or not all(
+            isinstance(pattern, str) for pattern in value
+        ):
+            warn(f"{key} in {path} has to be a list of module patterns")
+            return default
+        return tuple(value)
+
+    return (
+        patterns("include", default_config[0]),
+        patterns("exclude", default_config[1]),
+        patterns("eager", default_config[2]),
+    )
+
+
+def keyword_config(dist):
+    """The configuration in the keywords of the distribution metadata (like
+    `lazy-imports-lite-exclude=pkg.legacy`) or None."""
+    metadata = dist.metadata
+    options = {"include": [], "exclude": [], "eager": []}
+    found = False
+    for keyword in (metadata["Keywords"] or "").split(","):
+        keyword = keyword.strip()
+        if not keyword.startswith("lazy-imports-lite-"):
+            continue
+        key, sep, pattern = keyword[len("lazy-imports-lite-") :].partition("=")
+        if key == "enabled" and not sep:
+            continue
+        if key not in options or not pattern:
+            warn(f"unknown keyword {keyword!r} in the metadata of {metadata['Name']}")
+            continue
+        options[key].append(pattern)
+        found = True
+
+    if not found:
+        return None
+    return (
+        tuple(options["include"]) or default_config[0],
+        tuple(options["exclude"]),
+        tuple(options["eager"]),
+    )
+
+
+def distribution_config(dist):
+    """Returns the configuration of the distribution (None if it has none) and
+    the path of its pyproject.toml (None if the project directory is unknown).
+
+    The [tool.lazy-imports-lite] table in the pyproject.toml is preferred,
+    because it can be changed without a reinstall.
+    """
+    path = pyproject_path(dist)
+    config = None if path is None else read_config(path)
+    if config is None:
+        config = keyword_config(dist)
+    return config, path
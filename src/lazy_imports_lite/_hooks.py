@@ -1,9 +1,255 @@
+import _thread
+import builtins
+import contextlib
 import importlib
+import importlib.machinery
+import importlib.util
+import sys
+import time
+import types
+import weakref
 from collections import defaultdict
 
+from ._config import matches
+
+# typing is only imported by the type checker, this module is imported at startup
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import DefaultDict
+    from typing import Dict
+    from typing import Tuple
+
+
+# Protects the publication of resolved values and the state of the modules
+# (LazyGlobals). It is never held while a module is imported, because the
+# imported module could resolve lazy objects in an other thread (deadlock).
+# importlib makes sure that every module is executed only once.
+lock = _thread.RLock()
+
 
 class LazyObject:
-    __slots__ = ("_lazy_value",)
+    __slots__ = ("_lazy_value", "_lazy_binding")
+
+    def __getattr__(self, name):
+        if name == "_lazy_value":
+            # this is only called until the value is published, the access of
+            # the resolved value needs no lock
+            if resolution_listeners is None:
+                value = self._lazy_import()
+            else:
+                value = observed(self, self._lazy_target(), self._lazy_import)
+
+            return self._lazy_publish(value)
+        elif name == "_lazy_binding":
+            # the object is not (yet) bound to the globals of a module
+            return None
+        else:
+            assert False
+
+    def __set_name__(self, owner, name):
+        # the import is part of a class body
+        with lock:
+            namespace = ClassNamespace(owner)
+            if is_resolved(self):
+                namespace.write_back(name, self, LazyObject._lazy_value.__get__(self))
+            else:
+                self._lazy_binding = (namespace, name)
+
+    def __get__(self, instance, owner=None):
+        value = self._lazy_value
+        get = getattr(type(value), "__get__", None)
+        if get is None:
+            return value
+        # imported functions become methods
+        return get(value, instance, owner)
+
+    def _lazy_publish(self, value):
+        with lock:
+            if is_resolved(self):
+                # an other thread was faster
+                return LazyObject._lazy_value.__get__(self)
+
+            self._lazy_value = value
+
+            binding = self._lazy_binding
+            if binding is not None:
+                lazy_globals, key = binding
+                lazy_globals.write_back(key, self, value)
+
+        return value
+
+
+# the functions which are called after every resolution of a lazy object or of
+# a submodule of `import a.b.c` (see _profile and _stats). None if there are
+# no listeners, which keeps the resolution as fast as without them.
+resolution_listeners = None
+
+
+def add_resolution_listener(listener):
+    """`listener(obj, target, start, duration, failed)` is called after every
+    resolution. `obj` is None for submodules and `target` is (module, name or
+    None)."""
+    global resolution_listeners
+    resolution_listeners = [*(resolution_listeners or ()), listener]
+
+
+def observed(obj, target, function, *args):
+    start = time.perf_counter()
+    failed = True
+    try:
+        result = function(*args)
+        failed = False
+        return result
+    finally:
+        duration = time.perf_counter() - start
+        for listener in resolution_listeners:
+            listener(obj, target, start, duration, failed)
+
+
+class ClassNamespace:
+    """Replaces the lazy objects in a class with their values (like
+    LazyGlobals does for modules)."""
+
+    __slots__ = ("owner",)
+
+    def __init__(self, owner):
+        self.owner = weakref.ref(owner)
+
+    def write_back(self, key, obj, value):
+        owner = self.owner()
+        if owner is not None and owner.__dict__.get(key) is obj:
+            try:
+                setattr(owner, key, value)
+            except (AttributeError, TypeError):
+                # the metaclass does not allow it, LazyObject.__get__ is used
+                pass
+
+
+def is_resolved(obj):
+    try:
+        LazyObject._lazy_value.__get__(obj)
+    except AttributeError:
+        return False
+    return True
+
+
+def lazy_value(obj):
+    """Used by transformed code for every access to a name which was bound by
+    an import statement.
+
+    The name refers to the LazyObject until it is resolved and to the imported
+    object afterwards (see LazyGlobals).
+    """
+    if isinstance(obj, LazyObject):
+        return obj._lazy_value
+    return obj
+
+
+# (module, function, name) -> number of executed lazy_value() calls (see
+# count_lazy_loads)
+lazy_value_counts: "DefaultDict[Tuple[str, str, str], int]" = defaultdict(int)
+
+
+def counted_lazy_value(obj, module, function, name):
+    """lazy_value() for the instrumented modules.
+
+    The counts are not exact if multiple threads use the same name.
+    """
+    lazy_value_counts[module, function, name] += 1
+    if isinstance(obj, LazyObject):
+        return obj._lazy_value
+    return obj
+
+
+def local_import(obj):
+    """Used by transformed code for the imports inside of functions (see
+    `hoist_function_imports`).
+
+    The import raises the original exception like the import statement, which
+    allows the usual `try: ... except ImportError: ...` handling.
+    """
+    if isinstance(obj, Import) and not is_resolved(obj):
+        # `import a.b.c` imports the submodules like the import statement
+        for module in obj.submodules:
+            importlib.import_module(module)
+    if isinstance(obj, LazyObject):
+        try:
+            return obj._lazy_value
+        except LazyImportError as e:
+            if e.__context__ is None:
+                raise  # pragma: no cover
+            raise e.__context__ from None
+    return obj
+
+
+# Transformed functions reference `__lazy_imports_lite__` in their code, but
+# the name is removed from the module globals after the module is executed.
+# The lookup falls back to the builtins.
+builtins.__lazy_imports_lite__ = sys.modules[__name__]  # type: ignore
+
+
+# the lists of the lazy objects which are created in the eager_imports() blocks
+# of the current thread (None for lazy_imports() blocks)
+recording = _thread._local()
+
+
+def record(obj):
+    blocks = getattr(recording, "blocks", None)
+    if blocks and blocks[-1] is not None:
+        blocks[-1].append(obj)
+
+
+@contextlib.contextmanager
+def eager_imports():
+    """The imports inside of the block are executed immediately.
+
+    The imports of the block are not transformed if it is part of a module.
+    All lazy objects which are created while the block is executed (by
+    modules which are imported in the block) are resolved at the end of the
+    block, which makes the imports of these modules eager too.
+    """
+    objects = []
+    blocks = recording.__dict__.setdefault("blocks", [])
+    blocks.append(objects)
+    try:
+        yield
+
+        # the resolved objects can create new lazy objects
+        i = 0
+        while i < len(objects):
+            obj = objects[i]
+            i += 1
+
+            binding = obj._lazy_binding
+            if binding is not None and is_hidden(binding[1]):
+                # the import inside of a function (hoist_function_imports)
+                continue
+
+            resolve_import(obj)
+    finally:
+        blocks.pop()
+
+
+def resolve_import(obj):
+    """Resolves the lazy object like the import statement would do (including
+    the submodules of `import a.b.c`)."""
+    local_import(obj)
+
+
+@contextlib.contextmanager
+def lazy_imports():
+    """The imports inside of the block are transformed into lazy objects (also
+    inside of functions).
+
+    The lazy objects which are created in the block are not resolved by an
+    enclosing eager_imports() block.
+    """
+    blocks = recording.__dict__.setdefault("blocks", [])
+    blocks.append(None)
+    try:
+        yield
+    finally:
+        blocks.pop()
 
 
 class LazyImportError(BaseException):
@@ -18,32 +264,58 @@ class LazyImportError(BaseException):
             return f"Deferred importing of module '{self.module}' in '{self.package}' caused an error"
 
 
-class ImportFrom(LazyObject):
-    __slots__ = ("package", "module", "name", "_lazy_value")
+class ImportRegistry:
+    """The lazy imports which are not resolved yet.
 
-    def __init__(self, package, module, name):
-        self.package = package
-        self.module = module
-        self.name = name
+    Entries are removed when they are resolved. All methods have to be called
+    with the lock held.
+    """
 
-    def __getattr__(self, name):
-        if name == "_lazy_value":
-            module = safe_import(self.module, self.package)
-            try:
-                attr = getattr(module, self.name)
-            except AttributeError:
-                attr = safe_import(self.module + "." + self.name, self.package)
-            self._lazy_value = attr
-            return attr
-        else:
-            assert False
+    def __init__(self):
+        # (module, package) -> interned absolute module name
+        self.absolute_names = {}
+        # absolute module name -> [ImportFrom]
+        self.from_imports = {}
+
+    def absolute_name(self, module, package):
+        if not module.startswith("."):
+            return sys.intern(module)
+
+        key = (module, package)
+        try:
+            return self.absolute_names[key]
+        except KeyError:
+            pass
+
+        try:
+            name = importlib.util.resolve_name(module, package)
+        except (ImportError, ValueError):
+            # the error is raised when the object is resolved
+            return None
 
+        name = self.absolute_names[key] = sys.intern(name)
+        return name
 
-pending_imports = defaultdict(list)
-imported_modules = set()
+    def add_from_import(self, module, obj):
+        self.from_imports.setdefault(module, []).append(obj)
+
+    def pop_from_imports(self, module):
+        return self.from_imports.pop(module, ())
+
+
+registry = ImportRegistry()
 
 
 def safe_import(module, package=None):
+    name = module
+    if module.startswith("."):
+        with lock:
+            name = registry.absolute_name(module, package)
+
+    if name is not None and is_imported(name):
+        # the fast path for modules which are already imported
+        return sys.modules[name]
+
     try:
         return importlib.import_module(module, package)
     except LazyImportError:
@@ -52,52 +324,613 @@ def safe_import(module, package=None):
         raise LazyImportError(module, package)
 
 
+def is_imported(name):
+    """True if the module `name` is imported and not initializing in an other
+    thread."""
+    module = sys.modules.get(name)
+    return module is not None and not getattr(
+        getattr(module, "__spec__", None), "_initializing", False
+    )
+
+
+def find_spec(name):
+    """Like importlib.util.find_spec(), which imports only the parent packages
+    of `name`."""
+    try:
+        return importlib.util.find_spec(name)
+    except ValueError:
+        # the module is already imported but has no __spec__
+        module = sys.modules[name]
+        return importlib.machinery.ModuleSpec(
+            name, None, is_package=hasattr(module, "__path__")
+        )
+
+
+def find_imports(package, *imports):
+    """Used by transformed code for `try: import ... except ImportError: ...`
+    (see `probe_imports`).
+
+    Returns True if all `imports` ((module,) for `import module` and (module,
+    name) for `from module import name`) can be found. The names which are
+    imported from a module are assumed to exist, only packages are imported to
+    check for their submodules and attributes.
+    """
+    try:
+        for module, *names in imports:
+            module = importlib.util.resolve_name(module, package)
+            spec = find_spec(module)
+            if spec is None:
+                return False
+
+            if spec.submodule_search_locations is None:
+                continue
+
+            for name in names:
+                if find_spec(f"{module}.{name}") is None and not hasattr(
+                    sys.modules.get(module), name
+                ):
+                    return False
+    except ImportError:
+        return False
+
+    return True
+
+
+class ImportFrom(LazyObject):
+    __slots__ = ("package", "module", "name")
+
+    def __init__(self, package, module, name):
+        self.package = package
+        # the constants of the module code are not shared between modules
+        self.module = sys.intern(module)
+        self.name = name
+        with lock:
+            absolute_name = registry.absolute_name(module, package)
+            if absolute_name is not None:
+                registry.add_from_import(absolute_name, self)
+        record(self)
+
+    def _lazy_target(self):
+        with lock:
+            absolute_name = registry.absolute_name(self.module, self.package)
+        return (absolute_name or self.module, self.name)
+
+    def _lazy_import(self):
+        module = safe_import(self.module, self.package)
+
+        namespace = getattr(module, "__dict__", {})
+
+        # the module can still rebind the names while it is initialized
+        # (circular import), the siblings are resolved by a later import
+        if not getattr(getattr(module, "__spec__", None), "_initializing", False):
+            with lock:
+                absolute_name = registry.absolute_name(self.module, self.package)
+                # resolve the other names which are imported from this module
+                siblings = registry.pop_from_imports(absolute_name)
+            for sibling in siblings:
+                if (
+                    sibling is not self
+                    and sibling.name in namespace
+                    and not isinstance(namespace[sibling.name], LazyObject)
+                    and not is_resolved(sibling)
+                ):
+                    sibling._lazy_publish(namespace[sibling.name])
+
+        if namespace.get(self.name) is not self:
+            # `from . import module` binds this object in the package
+            try:
+                return getattr(module, self.name)
+            except AttributeError:
+                pass
+        if self.module.endswith("."):
+            # `from . import module`
+            return safe_import(self.module + self.name, self.package)
+        return safe_import(self.module + "." + self.name, self.package)
+
+
+# the code flag of functions, which have no f_locals dict
+CO_OPTIMIZED = 0x1
+
+
 class Import(LazyObject):
-    __slots__ = ("module", "_lazy_value")
+    __slots__ = ("module", "submodules")
 
     def __init__(self, module):
         self.module = module
-        m = self.module.split(".")[0]
 
-        if m in imported_modules:
-            safe_import(self.module)
-        else:
-            pending_imports[m].append(module)
+        # `import a.b` and `import a.c` bind `a` in the same namespace, the
+        # submodules of the previous binding are still imported by `a`
+        submodules = (module,) if "." in module else ()
+        frame = sys._getframe(1)
+        if not frame.f_code.co_flags & CO_OPTIMIZED:
+            previous = frame.f_locals.get(module.partition(".")[0])
+            if isinstance(previous, (Import, SubmoduleProxy)):
+                submodules = (*previous._lazy_submodules(), *submodules)
+        self.submodules = tuple(dict.fromkeys(submodules))
+        record(self)
+
+    def _lazy_target(self):
+        return (self.module.partition(".")[0], None)
+
+    def _lazy_submodules(self):
+        if is_resolved(self):
+            value = LazyObject._lazy_value.__get__(self)
+            if isinstance(value, SubmoduleProxy):
+                return value._lazy_submodules()
+            return ()
+        return self.submodules
+
+    def _lazy_import(self):
+        module = safe_import(self.module.partition(".")[0])
+
+        pending = [name for name in self.submodules if not is_imported(name)]
+        if pending:
+            return SubmoduleProxy(module, pending, self)
+        return module
+
+
+class SubmoduleProxy:
+    """The value of `a` after `import a.b.c` as long as `a.b` or `a.b.c` are
+    not imported.
+
+    The submodules are imported when they are accessed. The proxy of `a` is
+    replaced with the module in the namespace of the import as soon as the
+    submodules of this binding are imported.
+    """
+
+    # the submodules which are imported by this binding are cached in the
+    # __dict__ of the proxy, which avoids the call of __getattr__
+    __slots__ = ("_lazy_module", "_lazy_pending", "_lazy_owner", "__dict__")
+
+    def __init__(self, module, pending, owner):
+        object.__setattr__(self, "_lazy_module", module)
+        # the submodules below `module` which are not imported yet
+        object.__setattr__(self, "_lazy_pending", pending)
+        # the Import of `a` or (parent proxy, name) for the proxy of `a.b`
+        object.__setattr__(self, "_lazy_owner", owner)
+
+    @property  # type: ignore[misc]
+    def __class__(self):
+        # isinstance(a, types.ModuleType)
+        return type(self._lazy_module)
+
+    def _lazy_submodules(self):
+        return self._lazy_pending
 
     def __getattr__(self, name):
-        if name == "_lazy_value":
-            m = self.module.split(".")[0]
-            for pending in pending_imports[m]:
-                safe_import(pending)
-            result = safe_import(self.module.split(".")[0])
-            imported_modules.add(m)
-            self._lazy_value = result
-            return result
+        module = self._lazy_module
+        submodule = f"{module.__name__}.{name}"
+        prefix = submodule + "."
+
+        below = [
+            m for m in self._lazy_pending if m == submodule or m.startswith(prefix)
+        ]
+        if not below:
+            return getattr(module, name)
+
+        if resolution_listeners is None or is_imported(submodule):
+            safe_import(submodule)
         else:
-            assert False
+            observed(None, (submodule, None), safe_import, submodule)
+
+        value = getattr(module, name)
+
+        with lock:
+            if name in self.__dict__:
+                # an other thread was faster
+                return self.__dict__[name]
+
+            below = [m for m in below if not is_imported(m)]
+            if below:
+                value = SubmoduleProxy(value, below, (self, name))
+            self.__dict__[name] = value
+            self._lazy_update()
+
+        return value
+
+    def _lazy_update(self):
+        """Removes the imported submodules and replaces the proxy with the
+        module if all are imported (called with the lock held)."""
+        pending = [m for m in self._lazy_pending if not is_imported(m)]
+        object.__setattr__(self, "_lazy_pending", pending)
+        if pending:
+            return
+
+        module = self._lazy_module
+        owner = self._lazy_owner
+        if isinstance(owner, Import):
+            owner._lazy_value = module
+            binding = owner._lazy_binding
+            if binding is not None:
+                namespace, key = binding
+                namespace.write_back(key, self, module)
+        else:
+            parent, name = owner
+            if parent.__dict__.get(name) is self:
+                parent.__dict__[name] = module
+            parent._lazy_update()
+
+    def __setattr__(self, name, value):
+        self.__dict__.pop(name, None)
+        setattr(self._lazy_module, name, value)
+
+    def __delattr__(self, name):
+        self.__dict__.pop(name, None)
+        delattr(self._lazy_module, name)
+
+    def __dir__(self):
+        return dir(self._lazy_module)
+
+    def __repr__(self):
+        return repr(self._lazy_module)
 
 
 class ImportAs(LazyObject):
-    __slots__ = ("module", "_lazy_value")
+    __slots__ = ("module",)
 
     def __init__(self, module):
         self.module = module
+        record(self)
+
+    def _lazy_target(self):
+        return (self.module, None)
+
+    def _lazy_import(self):
+        return safe_import(self.module)
+
+
+def is_hidden(key):
+    """The names which are added to the globals by the transformer."""
+    return isinstance(key, str) and key.startswith("__lazy_imports_lite_")
+
+
+class GlobalsView(dict):
+    """The result of `globals()` in a transformed module which has unresolved
+    lazy objects.
+
+    The view reads and writes the module globals directly and resolves the
+    lazy objects only for the keys which are read. It is a dict (its own items
+    are never used), because functions like `typing.get_type_hints()` or
+    `types.FunctionType()` require one.
+    """
+
+    __slots__ = ("_globals", "_state")
+
+    def __init__(self, globals, state):
+        super().__init__()
+        self._globals = globals
+        self._state = state
+
+    def __getitem__(self, key):
+        value = self._globals[key]
+        if isinstance(value, LazyObject) and not is_hidden(key):
+            return resolve_global(self._globals, key, value)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        self._globals[key] = value
+        if not isinstance(value, LazyObject):
+            self._release(key)
+
+    def __delitem__(self, key):
+        del self._globals[key]
+        self._release(key)
+
+    def _release(self, key):
+        if self._state.active:
+            self._state.release(key)
+
+    def __contains__(self, key):
+        return key in self._globals
+
+    def __iter__(self):
+        return iter(self._globals)
+
+    def __reversed__(self):
+        return reversed(self._globals)
+
+    def __len__(self):
+        return len(self._globals)
+
+    def __repr__(self):
+        return repr(resolve_globals(self._globals))
+
+    def __eq__(self, other):
+        return resolve_globals(self._globals) == other
+
+    def __ne__(self, other):
+        return resolve_globals(self._globals) != other
+
+    def __or__(self, other):
+        return resolve_globals(self._globals) | other
+
+    def __ror__(self, other):
+        return other | resolve_globals(self._globals)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def keys(self):
+        return self._globals.keys()
+
+    def values(self):
+        return resolve_globals(self._globals).values()
+
+    def items(self):
+        return resolve_globals(self._globals).items()
+
+    def copy(self):
+        return resolve_globals(self._globals).copy()
+
+    def pop(self, key, *default):
+        if key not in self._globals:
+            return self._globals.pop(key, *default)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self):
+        if not self._globals:
+            raise KeyError("popitem(): dictionary is empty")
+        key = next(reversed(self._globals))
+        return key, self.pop(key)
+
+    def setdefault(self, key, default=None):
+        if key not in self._globals:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        for key in list(self._globals):
+            del self[key]
+
+
+def globals():
+    """Replaces `globals()` in transformed modules.
+
+    Returns the module dict when all its lazy objects are resolved and a
+    GlobalsView of it otherwise. The view is created once per module execution.
+    """
+    module_globals = sys._getframe(1).f_globals
+
+    state = module_state(module_globals)
+    if state is None:
+        # the module was not loaded by the LazyLoader (transformed scripts)
+        return resolve_globals(module_globals)
+
+    if state.resolved:
+        return module_globals
+    if state.view is None:
+        # the transformed code falls back to the builtins
+        module_globals.pop("__lazy_imports_lite__", None)
+        state.view = GlobalsView(module_globals, state)
+    return state.view
+
+
+def module_state(module_globals):
+    """The LazyGlobals of the module with the dict `module_globals` or None."""
+    state = lazy_globals.get(module_globals.get("__name__"))
+    if state is None or state.globals is not module_globals:
+        return None
+    return state
+
+
+def resolve_global(module_globals, key, value):
+    resolved = value._lazy_value
+    if module_globals.get(key) is value:
+        # the module is not activated yet
+        module_globals[key] = resolved
+    return resolved
+
+
+def resolve_globals(module_globals):
+    """Resolves all lazy objects in `module_globals` and returns the dict."""
+    # the transformed code falls back to the builtins
+    module_globals.pop("__lazy_imports_lite__", None)
+
+    for key, value in list(module_globals.items()):
+        if isinstance(value, LazyObject) and not is_hidden(key):
+            resolve_global(module_globals, key, value)
+    return module_globals
+
+
+# the targets (see LazyObject._lazy_target) which are used by `dataclasses` to
+# check string annotations
+type_qualifier_targets = {
+    ("typing", "ClassVar"),
+    ("typing", None),
+    ("dataclasses", "InitVar"),
+    ("dataclasses", None),
+}
+
+
+def type_qualifiers(*names):
+    """Used at the end of class bodies in modules with `from __future__ import
+    annotations`.
+
+    `names` are the first names of the annotations in the class body. The lazy
+    objects which refer to `ClassVar`, `InitVar` or their modules are resolved,
+    because `dataclasses` looks them up in the module dict.
+    """
+    module_globals = sys._getframe(1).f_globals
+    for name in names:
+        value = module_globals.get(name)
+        if (
+            isinstance(value, LazyObject)
+            and value._lazy_target() in type_qualifier_targets
+        ):
+            resolve_global(module_globals, name, value)
+
+
+def namespaces(globals, locals, frame):
+    if globals is None:
+        globals = frame.f_globals
+        state = module_state(globals)
+        if state is None or not state.resolved:
+            # `global` statements in the code write directly into the dict
+            # (a GlobalsView would not see them)
+            resolve_globals(globals)
+        if locals is None:
+            locals = frame.f_locals
+    return globals, locals
+
+
+def eval(source, globals=None, locals=None, /):
+    """Replaces `eval()` in transformed modules.
+
+    The code is evaluated in the module globals after all lazy objects of the
+    module are resolved, because the code can use any global name.
+    """
+    globals, locals = namespaces(globals, locals, sys._getframe(1))
+    return builtins.eval(source, globals, locals)
+
+
+def exec(source, globals=None, locals=None, /, **kwargs):
+    """Replaces `exec()` in transformed modules (see eval)."""
+    globals, locals = namespaces(globals, locals, sys._getframe(1))
+    return builtins.exec(source, globals, locals, **kwargs)
+
+
+def global_names(code):
+    """All global names which can be used by `code` and its nested
+    functions."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= global_names(const)
+    return names
+
+
+lazy_globals: "Dict[str, LazyGlobals]" = {}
+
+
+class LazyGlobals:
+    """Manages the lazy objects in the globals of one transformed module.
+
+    Resolved lazy objects are replaced with their value in the module
+    globals. The transformed functions of the module are switched to their
+    plain code (code without `lazy_value()` calls) when all the globals they use
+    are resolved. This makes the access of an imported name as fast as with
+    normal imports.
+    """
+
+    def __init__(self, globals, plain_codes, module=None):
+        self.globals = globals
+        self.plain_codes = plain_codes
+        self.module = module
+        self.active = False
+        self.functions = []
+        self.waiting = defaultdict(list)
+        self.specialized = []
+        # globals() returns the module dict when no lazy objects are left
+        self.resolved = False
+        self.view = None
+
+    def track(self, function):
+        plain_code = self.plain_codes.get(function.__code__)
+        if plain_code is not None:
+            self.functions.append(
+                (weakref.ref(function), plain_code, global_names(plain_code))
+            )
+
+    def activate(self):
+        """Called after the module was executed."""
+        with lock:
+            self.active = True
+            for key, value in list(self.globals.items()):
+                if isinstance(value, LazyObject):
+                    if is_resolved(value):
+                        self.globals[key] = value._lazy_value
+                    else:
+                        value._lazy_binding = (self, key)
+
+            for key in list(getattr(type(self.module), "lazy_attributes", ())):
+                if not isinstance(self.globals.get(key), LazyObject):
+                    self.release(key)
+
+            functions, self.functions = self.functions, []
+            for function in functions:
+                self.specialize(function)
+
+            self.resolved = not getattr(type(self.module), "lazy_attributes", ())
+
+    def write_back(self, key, obj, value):
+        if self.globals.get(key) is obj:
+            self.globals[key] = value
+
+        if not isinstance(self.globals.get(key), LazyObject):
+            self.release(key)
+
+        for function in self.waiting.pop(key, []):
+            self.specialize(function)
+
+    def release(self, key):
+        """The module attribute `key` is no longer a lazy object (see
+        LazyModule)."""
+        release_attribute = getattr(type(self.module), "release_attribute", None)
+        if release_attribute is not None:
+            with lock:
+                release_attribute(self.module, key)
+            self.resolved = not getattr(type(self.module), "lazy_attributes", ())
+
+    def specialize(self, function_info):
+        function_ref, plain_code, names = function_info
+        function = function_ref()
+        if function is None:
+            return
+
+        for name in names:
+            if isinstance(self.globals.get(name), LazyObject):
+                # try again when this name is resolved
+                self.waiting[name].append(function_info)
+                return
+
+        self.specialized.append((function_ref, function.__code__))
+        function.__code__ = plain_code
+
+    def deactivate(self):
+        """Reverts all functions to their lazy code (the module is reloaded
+        and its globals will contain new lazy objects)."""
+        with lock:
+            for function_ref, code in self.specialized:
+                function = function_ref()
+                if function is not None:
+                    function.__code__ = code
+            self.specialized.clear()
+            self.waiting.clear()
+            self.active = False
 
-    def __getattr__(self, name):
-        if name == "_lazy_value":
-            module = safe_import(self.module)
-            self._lazy_value = module
-            return module
-        else:
-            assert False
 
+def pending_objects(packages=None):
+    """The unresolved lazy objects in the globals of all transformed modules
+    (or of the modules which match the patterns in `packages`)."""
+    for name, state in list(lazy_globals.items()):
+        if packages is not None and not matches(name, packages):
+            continue
+        for key, value in list(state.globals.items()):
+            if (
+                isinstance(value, LazyObject)
+                and not is_hidden(key)
+                and not is_resolved(value)
+            ):
+                yield value
 
-def make_globals(global_provider):
-    def g():
-        return {
-            key: value._lazy_value if isinstance(value, LazyObject) else value
-            for key, value in dict(global_provider()).items()
-            if key not in ("globals", "__lazy_imports_lite__")
-        }
 
-    return g
+def track(function):
+    """Decorator for the functions which are defined during the execution of a
+    transformed module."""
+    state = lazy_globals.get(function.__module__)
+    if state is not None and state.globals is function.__globals__:
+        state.track(function)
+    return function
@@ -1,39 +1,140 @@
 import ast
+import copy
 import importlib.abc
 import importlib.machinery
-import importlib.metadata
 import os
 import sys
 import types
 
+from ._archive import open_archive
+from ._cache import cache_key
+from ._cache import cache_path
+from ._cache import file_key
+from ._cache import fix_filename
+from ._cache import read_cache
+from ._cache import write_cache
+from ._cache import write_entry
+from ._config import distribution_config
+from ._config import is_included
+from ._config import matches
+from ._hooks import lazy_globals
+from ._hooks import LazyGlobals
 from ._hooks import LazyObject
+from ._transformer import pragma_lines
+from ._transformer import transformer_options
 from ._transformer import TransformModuleImports
 
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict
+    from typing import FrozenSet
+    from typing import Optional
+    from typing import Set
+    from typing import Tuple
+
+    from ._archive import Archive
+
 
 class LazyModule(types.ModuleType):
-    def __getattribute__(self, name):
-        value = super().__getattribute__(name)
+    """Type of the transformed modules.
+
+    Every module gets its own subclass with a LazyAttribute for every name
+    which can refer to a lazy object (see lazy_module_type). The descriptor is
+    removed when the name is resolved and the module becomes a normal module
+    when all names are resolved, which makes the attribute access as fast as
+    for any other module.
+    """
+
+    lazy_attributes: "FrozenSet[str]" = frozenset()
+
+    def release_attribute(self, name):
+        cls = type(self)
+        if name in cls.lazy_attributes:
+            delattr(cls, name)
+            cls.lazy_attributes = cls.lazy_attributes - {name}
+
+        if not cls.lazy_attributes:
+            self.__class__ = types.ModuleType
+
+
+class LazyAttribute:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, module, owner=None):
+        if module is None:
+            return self
+
+        try:
+            value = module.__dict__[self.name]
+        except KeyError:
+            # falls back to the `__getattr__` of the module
+            raise AttributeError(
+                f"module {module.__name__!r} has no attribute {self.name!r}"
+            ) from None
+
         if isinstance(value, LazyObject):
             return value._lazy_value
         return value
 
-    def __setattr__(self, name, value):
+    def __set__(self, module, value):
+        module.__dict__[self.name] = value
+        if not isinstance(value, LazyObject):
+            self.release(module)
+
+    def __delete__(self, module):
         try:
-            current_value = super().__getattribute__(name)
-        except:
-            super().__setattr__(name, value)
-        else:
-            if isinstance(current_value, LazyObject):
-                current_value._lazy_value = value
-            else:
-                super().__setattr__(name, value)
+            del module.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+        self.release(module)
 
+    def release(self, module):
+        state = lazy_globals.get(module.__name__)
+        if state is not None and state.active:
+            state.release(self.name)
 
-enabled_packages = set()
 
+def lazy_module_type(names):
+    return type(
+        "LazyModule",
+        (LazyModule,),
+        {
+            "__module__": __name__,
+            "lazy_attributes": frozenset(names),
+            **{name: LazyAttribute(name) for name in names},
+        },
+    )
+
+
+enabled_packages: "Set[str]" = set()
+
+# package -> configuration of the distribution (see _config)
+package_configs: "Dict[str, Tuple[Tuple[str, ...], ...]]" = {}
+
+# the modules which count their lazy references (LAZY_IMPORTS_LITE_INSTRUMENT)
+instrumented_modules = ()
+
+
+def enabled_package(fullname):
+    """Returns the enabled package which contains the module `fullname` or
+    None."""
+    name, dot, rest = fullname.partition(".")
+    if name in enabled_packages:
+        return name
+    if dot:
+        # namespace packages are enabled with "namespace.package"
+        namespace_name = f"{name}.{rest.partition('.')[0]}"
+        if namespace_name in enabled_packages:
+            return namespace_name
+    return None
+
+
+def enabled_distributions():
+    import importlib.metadata
 
-def scan_distributions():
-    global enabled_packages
     for dist in importlib.metadata.distributions():
         metadata = dist.metadata
 
@@ -45,8 +146,25 @@ def scan_distributions():
 
         keywords = metadata["Keywords"].split(",")
         if "lazy-imports-lite-enabled" in keywords:
-            for pkg in _top_level_declared(dist) or _top_level_inferred(dist):
-                enabled_packages.add(pkg)
+            yield dist
+
+
+def scan_distributions():
+    """Returns the top-level packages, their configurations and the
+    configuration files of the enabled distributions."""
+    packages = set()
+    configs = {}
+    files = []
+    for dist in enabled_distributions():
+        config, path = distribution_config(dist)
+        if path is not None:
+            files.append(path)
+
+        for pkg in _top_level_declared(dist) or _top_level_inferred(dist):
+            packages.add(pkg)
+            if config is not None:
+                configs[pkg] = config
+    return packages, configs, files
 
 
 def _top_level_declared(dist):
@@ -74,11 +192,11 @@ def _top_level_inferred(dist):
 
 class LazyLoader(importlib.abc.Loader, importlib.machinery.PathFinder):
     def find_spec(self, fullname, path=None, target=None):
-        if fullname.startswith("encodings."):
-            # fix wired windows bug
-            return None
-
-        if "LAZY_IMPORTS_LITE_DISABLE" in os.environ:
+        # this method is called for every import in the process.
+        # Modules of packages which are not enabled are rejected before
+        # the (expensive) search in the filesystem.
+        package = enabled_package(fullname)
+        if package is None:
             return None
 
         spec = super().find_spec(fullname, path, target)
@@ -89,24 +207,30 @@ class LazyLoader(importlib.abc.Loader, importlib.machinery.PathFinder):
         if spec.origin is None:
             return None  # pragma: no cover
 
-        name = spec.name.split(".")[0]
-        namespace_name = ".".join(spec.name.split(".")[:2])
+        if spec.origin.endswith(".py"):
+            config = package_configs.get(package)
+            if config is not None and not is_included(fullname, config):
+                return None
 
-        if (
-            name in enabled_packages or namespace_name in enabled_packages
-        ) and spec.origin.endswith(".py"):
-            origin: str = spec.origin
-            with open(origin) as f:
-                mod_raw = f.read()
-                mod_ast = ast.parse(mod_raw, origin, "exec")
-            for node in ast.walk(mod_ast):
-                if (
-                    isinstance(node, ast.Call)
-                    and isinstance(node.func, ast.Name)
-                    and node.func.id in ("eval", "exec")
-                ):
-                    return None
-            spec.mod_ast = mod_ast
+            eager_modules = config[2] if config is not None else ()
+            if spec.submodule_search_locations is None:
+                module_package = fullname.rpartition(".")[0]
+            else:
+                module_package = fullname
+
+            instrument = matches(fullname, instrumented_modules)
+            code = None if instrument else archived_code(package, fullname, spec.origin)
+            if code is None:
+                code = get_code(spec.origin, eager_modules, module_package, instrument)
+            if isinstance(code, str):
+                # the module can not be transformed
+                if sys.flags.verbose:
+                    print(
+                        f"# lazy-imports-lite: {fullname} is imported eagerly: {code}",
+                        file=sys.stderr,
+                    )
+                return None
+            spec.lazy_code = code
             spec.loader = self
             return spec
 
@@ -116,23 +240,317 @@ class LazyLoader(importlib.abc.Loader, importlib.machinery.PathFinder):
         return LazyModule(spec.name)
 
     def exec_module(self, module):
-        origin: str = module.__spec__.origin
+        lazy_code = module.__spec__.lazy_code
+        del module.__spec__.lazy_code
+        exec_lazy_code(module, lazy_code)
+
+
+def exec_lazy_code(module, lazy_code):
+    mod_code, plain_code, lazy_names = lazy_code
+
+    module.__class__ = lazy_module_type(lazy_names)
+
+    previous = lazy_globals.get(module.__name__)
+    if previous is not None:
+        # the module is reloaded
+        previous.deactivate()
+
+    state = LazyGlobals(module.__dict__, plain_codes(mod_code, plain_code), module)
+    lazy_globals[module.__name__] = state
+
+    exec(mod_code, module.__dict__)
+    module.__dict__.pop("__lazy_imports_lite__", None)
+
+    state.activate()
+
+    if isinstance(module, LazyModule) and not type(module).lazy_attributes:
+        module.__class__ = types.ModuleType
+
+
+def script_module(origin):
+    """The name of the module if the script `origin` is part of a package
+    (`pkg/cli.py` -> `pkg.cli`) or None."""
+    directory, filename = os.path.split(os.path.abspath(origin))
+    parts = [os.path.splitext(filename)[0]]
+    while os.path.isfile(os.path.join(directory, "__init__.py")):
+        directory, parent = os.path.split(directory)
+        parts.insert(0, parent)
+    return ".".join(parts) if len(parts) > 1 else None
+
+
+def run_main(origin, spec=None):
+    """Executes the file `origin` as `__main__` module with lazy imports.
+
+    `spec` is the spec of the module if it is executed like `python -m`.
+    """
+    module = types.ModuleType("__main__")
+    module.__file__ = origin
+    if spec is not None:
+        module.__spec__ = spec
+        module.__loader__ = spec.loader
+        module.__package__ = spec.parent
+    sys.modules["__main__"] = module
+
+    # the configuration of the package is used like in LazyLoader.find_spec(),
+    # which also gives the same cache entry for `python -m`
+    name = script_module(origin) if spec is None else spec.name
+    package = None if name is None else enabled_package(name)
+    config = package_configs.get(package) if package is not None else None
+
+    if config is not None and not is_included(name, config):
+        code = "excluded by the configuration"
+    else:
+        code = get_code(
+            origin,
+            config[2] if config is not None else (),
+            None if spec is None else spec.parent,
+            matches("__main__", instrumented_modules),
+        )
+    if isinstance(code, str):
+        # the module can not be transformed
+        if sys.flags.verbose:
+            print(
+                f"# lazy-imports-lite: __main__ is executed eagerly: {code}",
+                file=sys.stderr,
+            )
+        with open(origin, "rb") as f:
+            exec(compile(f.read(), origin, "exec"), module.__dict__)
+    else:
+        exec_lazy_code(module, code)
+
 
-        mod_ast = module.__spec__.mod_ast
-        del module.__spec__.mod_ast
+def plain_codes(code, plain_code, result=None):
+    """Maps the code objects of the transformed functions to their plain
+    versions.
 
-        transformer = TransformModuleImports()
-        new_ast = transformer.visit(mod_ast)
+    Both versions are generated from the same ast and contain the nested code
+    objects in the same order.
+    """
+    if result is None:
+        result = {}
+
+    codes = [c for c in code.co_consts if isinstance(c, types.CodeType)]
+    plain = [c for c in plain_code.co_consts if isinstance(c, types.CodeType)]
+
+    if len(codes) != len(plain):
+        return result  # pragma: no cover
+
+    for c, p in zip(codes, plain):
+        if (c.co_name, c.co_freevars, c.co_argcount) == (
+            p.co_name,
+            p.co_freevars,
+            p.co_argcount,
+        ):
+            result[c] = p
+            plain_codes(c, p, result)
+
+    return result
+
+
+# package directory -> mapped archive (None if there is no valid archive)
+archives: "Dict[str, Optional[Archive]]" = {}
+
+
+def archived_code(package, fullname, origin):
+    """Returns the code of the module from the archive of `package` or None if
+    there is no (valid) archive."""
+    depth = fullname.count(".") - package.count(".")
+    if os.path.basename(origin) == "__init__.py":
+        depth += 1
+
+    if depth == 0:
+        # the package is a single module
+        return None
+
+    package_dir = origin
+    for _ in range(depth):
+        package_dir = os.path.dirname(package_dir)
+
+    try:
+        archive = archives[package_dir]
+    except KeyError:
+        config = package_configs.get(package)
+        archive = archives[package_dir] = open_archive(
+            package_dir, config[2] if config is not None else ()
+        )
+
+    if archive is None:
+        return None
+
+    result = archive.get(origin[len(package_dir) + 1 :].replace(os.sep, "/"))
+    return None if result is None else fix_filename(result, origin)
+
+
+def get_code(origin, eager_modules=(), package=None, instrument=False):
+    """Returns the transformed and the plain code object and the names of the
+    lazy imports for the file `origin` or a string with the reason why it can
+    not be transformed.
+
+    The result is cached in `__pycache__`. `instrument` enables the
+    count_lazy_loads option.
+    """
+    options = transformer_options()
+    if instrument:
+        options += ("count_lazy_loads",)
+    key = cache_key(os.stat(origin), options, eager_modules, package)
+    cache_file = cache_path(origin)
+
+    if cache_file is not None:
+        result = read_cache(cache_file, key)
+        if result is not None:
+            return fix_filename(result, origin)
+
+    result = transform_file(origin, options, eager_modules, package)
+
+    if cache_file is not None:
+        write_cache(cache_file, key, result)
+
+    return result
+
+
+def unsafe_eval(tree):
+    """The reason why `tree` can not be transformed or None.
+
+    Calls of `eval()` and `exec()` are replaced with functions which resolve
+    the lazy objects in the globals (see TransformModuleImports), but
+    `builtins.eval()` with the implicit module globals would see the lazy
+    objects.
+    """
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr in ("eval", "exec")
+            and isinstance(node.func.value, ast.Name)
+            and node.func.value.id in ("builtins", "__builtins__")
+        ):
+            if len(node.args) < 2 or (
+                isinstance(node.args[1], ast.Call)
+                and isinstance(node.args[1].func, ast.Name)
+                and node.args[1].func.id == "globals"
+            ):
+                name = f"{node.func.value.id}.{node.func.attr}"
+                return f"uses {name}() with the module globals (line {node.lineno})"
+    return None
+
+
+def transform_file(origin, options=(), eager_modules=(), package=None):
+    with open(origin, "rb") as f:
+        mod_raw = f.read()
+        mod_ast = ast.parse(mod_raw, origin, "exec")
+
+    reason = unsafe_eval(mod_ast)
+    if reason is not None:
+        return reason
+
+    eager_lines = pragma_lines(mod_raw)
+
+    codes = []
+    for rewrite_names in (True, False):
+        transformer = TransformModuleImports(
+            rewrite_names=rewrite_names,
+            eager_lines=eager_lines,
+            eager_modules=eager_modules,
+            package=package,
+            **dict.fromkeys(options, True),
+        )
+        new_ast = transformer.visit(copy.deepcopy(mod_ast))
 
         ast.fix_missing_locations(new_ast)
-        mod_code = compile(new_ast, origin, "exec")
-        exec(mod_code, module.__dict__)
-        del module.__dict__["__lazy_imports_lite__"]
-        del module.__dict__["globals"]
+        codes.append(compile(new_ast, origin, "exec"))
+
+    return (*codes, tuple(dict.fromkeys(transformer.transformed_imports)))
+
+
+def registry_path():
+    return os.path.join(
+        os.path.dirname(__file__),
+        "__pycache__",
+        f"enabled-packages.{sys.implementation.cache_tag}",
+    )
+
+
+def registry_key():
+    """The registry of the enabled packages is valid as long as no
+    distribution was installed or removed from the directories in `sys.path`
+    (which changes the mtime of the directories)."""
+    # the first entry is the version of the registry format
+    key = [3]
+    for entry in sys.path:
+        try:
+            key.append((entry, os.stat(entry or ".").st_mtime_ns))
+        except OSError:
+            key.append((entry, None))
+    return tuple(key)
+
+
+def load_enabled_packages():
+    """Loads the enabled packages from the registry or scans the installed
+    distributions if the registry is outdated."""
+    path = registry_path()
+    key = registry_key()
+
+    registry = read_cache(path, key)
+    if registry is not None:
+        packages, configs, files = registry
+        # the configuration in pyproject.toml can change without a reinstall
+        if all(file_key(file) == file_stat for file, file_stat in files):
+            enabled_packages.update(packages)
+            package_configs.update(configs)
+            return
+
+    packages, configs = write_registry()
+    enabled_packages.update(packages)
+    package_configs.update(configs)
+
+
+def write_registry():
+    """Scans the installed distributions and writes the registry.
+
+    The registry is written even with PYTHONDONTWRITEBYTECODE, because the
+    scan would be repeated at every interpreter start otherwise.
+    """
+    packages, configs, files = scan_distributions()
+    files = [(file, file_key(file)) for file in files]
+    write_entry(registry_path(), registry_key(), (sorted(packages), configs, files))
+    return packages, configs
+
+
+def env_packages():
+    """The top-level packages which are enabled with the environment variable
+    LAZY_IMPORTS_LITE_PACKAGES (comma separated)."""
+    value = os.environ.get("LAZY_IMPORTS_LITE_PACKAGES", "")
+    return {name.strip() for name in value.split(",") if name.strip()}
 
 
 def setup():
-    scan_distributions()
+    if "LAZY_IMPORTS_LITE_DISABLE" in os.environ:
+        return
+
+    load_enabled_packages()
+    enabled_packages.update(env_packages())
+
+    profile_path = os.environ.get("LAZY_IMPORTS_LITE_PROFILE")
+    if profile_path:
+        from ._profile import start_recording
+
+        start_recording(profile_path)
+
+    stats_mode = os.environ.get("LAZY_IMPORTS_LITE_STATS")
+    if stats_mode:
+        from ._stats import enable_stats
+
+        enable_stats(print_at_exit=stats_mode == "importtime")
+
+    global instrumented_modules
+    instrument = os.environ.get("LAZY_IMPORTS_LITE_INSTRUMENT", "")
+    if instrument and not instrumented_modules:
+        import atexit
+
+        from ._stats import print_lazy_value_counts
+
+        instrumented_modules = tuple(p.strip() for p in instrument.split(",") if p)
+        atexit.register(print_lazy_value_counts)
 
     if not any(isinstance(m, LazyLoader) for m in sys.meta_path):
         sys.meta_path.insert(0, LazyLoader())
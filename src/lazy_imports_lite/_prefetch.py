@@ -0,0 +1,91 @@
+import importlib
+import importlib._bootstrap
+import time
+
+from ._hooks import LazyImportError
+from ._hooks import LazyObject
+from ._hooks import resolve_import
+
+# raised by importlib if two threads import modules which import each other
+DeadlockError = getattr(importlib._bootstrap, "_DeadlockError", RuntimeError)
+
+
+def prefetch(items, workers=None, timeout=None):
+    """Imports the modules (names) and resolves the lazy objects of `items` on
+    a thread pool with `workers` threads.
+
+    Modules are imported after their parent packages in `items`. Returns
+    False if the imports were not finished after `timeout` seconds (they
+    continue in the background). Import errors are raised when the imports
+    are used.
+    """
+    from concurrent.futures import FIRST_COMPLETED
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrent.futures import wait
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    # module -> items which import the module
+    jobs = {}
+    for item in items:
+        if isinstance(item, str):
+            module = item
+        elif isinstance(item, LazyObject):
+            module = item._lazy_target()[0]
+        else:
+            # the object is already resolved
+            continue
+        jobs.setdefault(module, []).append(item)
+
+    # the imports which wait for the import of their parent package
+    waiting = {}
+    ready = []
+    for module in jobs:
+        parent = module.rpartition(".")[0]
+        while parent and parent not in jobs:
+            parent = parent.rpartition(".")[0]
+        if parent:
+            waiting.setdefault(parent, []).append(module)
+        else:
+            ready.append(module)
+
+    deadlocked = []
+    executor = ThreadPoolExecutor(workers, thread_name_prefix="lazy-imports-lite")
+    try:
+        futures = {executor.submit(fetch, jobs[module]): module for module in ready}
+        while futures:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            done, _ = wait(futures, remaining, FIRST_COMPLETED)
+            if not done:
+                for future in futures:
+                    future.cancel()
+                return False
+
+            for future in done:
+                deadlocked += future.result()
+                for module in waiting.pop(futures.pop(future), []):
+                    futures[executor.submit(fetch, jobs[module])] = module
+    finally:
+        executor.shutdown(wait=False)
+
+    # the modules of circular imports are imported one after the other
+    fetch(deadlocked)
+    return True
+
+
+def fetch(items):
+    """Imports the items and returns the items which failed because of a
+    deadlock of the import locks."""
+    deadlocked = []
+    for item in items:
+        try:
+            if isinstance(item, str):
+                importlib.import_module(item)
+            else:
+                resolve_import(item)
+        except DeadlockError:
+            deadlocked.append(item)
+        except (Exception, LazyImportError):
+            # the error is raised again when the import is used
+            pass
+    return deadlocked
@@ -0,0 +1,127 @@
+import atexit
+import importlib
+import os
+import sys
+import time
+
+from ._cache import write_file
+from ._hooks import add_resolution_listener
+
+# Layout of a profile (a text file which can be committed with the service):
+#
+#   # lazy-imports-lite profile
+#   <duration in ms>\t<module>\t<imported name or empty>
+#
+# There is one line for every imported module (and name), in the order in
+# which the resolutions started. The durations include the nested imports.
+
+header = "# lazy-imports-lite profile\n"
+
+# (start, (module, name), duration) of the recorded resolutions
+recording = None
+
+
+def start_recording(path):
+    """Records the resolved imports and writes them to `path` when the
+    interpreter exits."""
+    global recording
+    if recording is not None:
+        return
+    recording = []
+    add_resolution_listener(record_resolution)
+    atexit.register(write_recording, os.path.abspath(path))
+
+
+def record_resolution(obj, target, start, duration, failed):
+    if not failed:
+        recording.append((start, target, duration))
+
+
+def recorded():
+    """The [(module, name, duration)] of the recorded resolutions in the order
+    in which they started."""
+    return [
+        (module, name, duration)
+        for _, (module, name), duration in sorted(recording or (), key=lambda r: r[0])
+    ]
+
+
+def write_recording(path):
+    write_profile(path, recorded())
+
+
+def write_profile(path, entries):
+    lines = [header]
+    seen = set()
+    for module, name, duration in entries:
+        if (module, name) in seen:
+            # the module was already imported
+            continue
+        seen.add((module, name))
+        lines.append(f"{duration * 1000:.3f}\t{module}\t{name or ''}\n")
+    write_file(path, "".join(lines).encode())
+
+
+def read_profile(path):
+    """Returns the [(module, name, duration)] of the profile at `path` without
+    duplicates."""
+    entries = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            duration, module, name = line.rstrip("\n").split("\t")
+            entries.setdefault((module, name or None), float(duration) / 1000)
+    return [(module, name, duration) for (module, name), duration in entries.items()]
+
+
+def warm_up(path, delay=0.0):
+    """Resolves the imports of the profile at `path` in a background thread,
+    which makes the first use of the lazy imports fast.
+
+    Returns the thread or None if the profile can not be read.
+    """
+    import threading
+
+    try:
+        entries = read_profile(path)
+    except (OSError, ValueError):
+        return None
+
+    thread = threading.Thread(
+        target=replay,
+        args=(entries, delay),
+        name="lazy-imports-lite-warm-up",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def lower_priority():
+    if sys.platform == "linux":
+        # the nice value applies to the thread on linux
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, 19)
+        except OSError:  # pragma: no cover
+            pass
+
+
+def replay(entries, delay):
+    lower_priority()
+    time.sleep(delay)
+
+    for module, name, _ in entries:
+        # the other threads can run between the imports
+        time.sleep(0)
+        import_entry(module, name)
+
+
+def import_entry(module, name):
+    try:
+        value = importlib.import_module(module)
+        if name is not None and not hasattr(value, name):
+            importlib.import_module(f"{module}.{name}")
+    except Exception:
+        # the import fails in the same way when it is used
+        pass
@@ -0,0 +1,64 @@
+import gc
+import os
+import sys
+
+from ._config import matches
+from ._hooks import LazyImportError
+from ._hooks import pending_objects
+from ._hooks import resolve_import
+from ._profile import import_entry
+from ._profile import read_profile
+
+
+def resolve_all(packages=None, profile=None, freeze=False):
+    """Resolves the lazy imports of all transformed modules (or of the modules
+    which match the patterns in `packages`).
+
+    Pre-fork servers can call this in the master process, which allows the
+    workers to share the imported modules copy-on-write. Only the imports of
+    a recorded `profile` are resolved if it is given. `gc.freeze()` is called
+    afterwards if `freeze` is true.
+
+    Returns (number of imported modules, change of the resident memory in
+    bytes or None if it is unknown).
+    """
+    if isinstance(packages, str):
+        packages = (packages,)
+
+    rss_before = rss()
+    modules_before = len(sys.modules)
+
+    if profile is not None:
+        for module, name, _ in read_profile(profile):
+            if packages is None or matches(module, packages):
+                import_entry(module, name)
+    else:
+        done = set()
+        while True:
+            # the imported modules can contain new lazy objects
+            objects = [obj for obj in pending_objects(packages) if obj not in done]
+            if not objects:
+                break
+            for obj in objects:
+                done.add(obj)
+                try:
+                    resolve_import(obj)
+                except (Exception, LazyImportError):
+                    # the error is raised again when the import is used
+                    pass
+
+    if freeze:
+        gc.freeze()
+
+    rss_after = rss()
+    rss_delta = None if rss_before is None else rss_after - rss_before
+    return len(sys.modules) - modules_before, rss_delta
+
+
+def rss():
+    """The resident memory of the process in bytes (linux only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
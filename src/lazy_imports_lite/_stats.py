@@ -0,0 +1,200 @@
+import atexit
+import importlib
+import os
+import sys
+from collections import namedtuple
+
+from ._hooks import add_resolution_listener
+from ._hooks import ClassNamespace
+from ._hooks import is_resolved
+from ._hooks import lazy_globals
+from ._hooks import lazy_value_counts
+from ._hooks import LazyObject
+
+ImportStat = namedtuple(
+    "ImportStat",
+    [
+        "module",  # the module (or class) which contains the lazy object
+        "name",  # the name of the lazy object in the module
+        "imported",  # (module, name or None)
+        "resolved",
+        "duration",  # seconds, None if it was not resolved with enabled stats
+        "thread",  # the name of the thread which resolved it
+        "location",  # (filename, line) of the first use
+    ],
+)
+
+
+class Resolution:
+    __slots__ = ("obj", "target", "start", "duration", "thread", "location", "stat")
+
+    def __init__(self, obj, target, start, duration, thread, location, stat):
+        self.obj = obj
+        self.target = target
+        self.start = start
+        self.duration = duration
+        self.thread = thread
+        self.location = location
+        self.stat = stat
+
+
+# the resolutions since the statistics were enabled
+resolutions = None
+
+internal_files = (os.path.join(os.path.dirname(__file__), ""), importlib.__file__)
+
+
+def enable_stats(print_at_exit=False):
+    """Collects the statistics of all resolutions from now on
+    (LAZY_IMPORTS_LITE_STATS)."""
+    global resolutions
+    if resolutions is not None:
+        return
+    resolutions = []
+    add_resolution_listener(record_resolution)
+    if print_at_exit:
+        atexit.register(print_import_times)
+
+
+def use_site():
+    """The first frame outside of lazy-imports-lite and importlib."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(internal_files) and not filename.startswith(
+            "<frozen importlib"
+        ):
+            break
+        frame = frame.f_back
+    return frame
+
+
+def binding(obj, frame):
+    """The (module, name) where the lazy object is stored."""
+    namespace, key = obj._lazy_binding or (None, None)
+    if isinstance(namespace, ClassNamespace):
+        owner = namespace.owner()
+        if owner is None:
+            return (None, key)  # pragma: no cover
+        return (f"{owner.__module__}.{owner.__qualname__}", key)
+    if namespace is not None:
+        return (namespace.globals.get("__name__"), key)
+
+    # the object is used while its module is executed
+    if frame is not None:
+        for key, value in list(frame.f_globals.items()):
+            if value is obj:
+                return (frame.f_globals.get("__name__"), key)
+    return (None, None)
+
+
+def record_resolution(obj, target, start, duration, failed):
+    import threading
+
+    frame = use_site()
+    location = None if frame is None else (frame.f_code.co_filename, frame.f_lineno)
+    thread = threading.current_thread()
+
+    stat = None
+    if obj is not None:
+        module, name = binding(obj, frame)
+        stat = ImportStat(
+            module, name, target, not failed, duration, thread.name, location
+        )
+
+    resolutions.append(
+        Resolution(obj, target, start, duration, thread.ident, location, stat)
+    )
+
+
+def stats():
+    """Returns an ImportStat for every lazy object which was resolved since the
+    statistics were enabled (LAZY_IMPORTS_LITE_STATS) or which is not resolved
+    yet."""
+    result = {}
+    for resolution in resolutions or ():
+        if resolution.stat is not None:
+            # the last attempt if the import failed before
+            result[id(resolution.obj)] = resolution.stat
+
+    for name, state in list(lazy_globals.items()):
+        for key, value in list(state.globals.items()):
+            if isinstance(value, LazyObject) and id(value) not in result:
+                result[id(value)] = ImportStat(
+                    name, key, value._lazy_target(), is_resolved(value), *[None] * 3
+                )
+    return list(result.values())
+
+
+def import_tree():
+    """The resolutions as [(resolution, children)] with the resolutions which
+    were triggered while an other resolution of the same thread was running
+    as children."""
+    roots = []
+    stacks = {}
+    for resolution in sorted(resolutions or (), key=lambda r: r.start):
+        node = (resolution, [])
+        stack = stacks.setdefault(resolution.thread, [])
+        while stack and stack[-1][0].start + stack[-1][0].duration <= resolution.start:
+            stack.pop()
+        (stack[-1][1] if stack else roots).append(node)
+        stack.append(node)
+    return roots
+
+
+def print_import_times(file=None):
+    """Prints the resolutions like `python -X importtime`.
+
+    The time of a deferred import is attributed to the place where the
+    imported name is used first, which is shown next to the module.
+    """
+    if file is None:
+        file = sys.stderr
+
+    def show(node, depth):
+        resolution, children = node
+        for child in children:
+            show(child, depth + 1)
+
+        cumulative = int(resolution.duration * 1e6)
+        self_time = cumulative - sum(int(c.duration * 1e6) for c, _ in children)
+        module, name = resolution.target
+        label = module if name is None else f"{module}:{name}"
+        if resolution.location is not None:
+            label += " ({}:{})".format(*resolution.location)
+        print(
+            f"import time: {self_time:9} | {cumulative:10} | {'  ' * depth}{label}",
+            file=file,
+        )
+
+    print("import time: self [us] | cumulative | imported package", file=file)
+    for root in import_tree():
+        show(root, 0)
+
+
+def print_lazy_value_counts(file=None, limit=20):
+    """Prints the functions and names with the most executed lazy references
+    (LAZY_IMPORTS_LITE_INSTRUMENT).
+
+    A function executes lazy references until all imported names it uses are
+    resolved (see LazyGlobals). Functions at the top of the list are
+    candidates for eager imports or for a restructuring.
+    """
+    if file is None:
+        file = sys.stderr
+
+    counts = dict(lazy_value_counts)
+    functions = {}
+    for (module, function, _), count in counts.items():
+        functions[module, function] = functions.get((module, function), 0) + count
+
+    def ranked(items):
+        return sorted(items, key=lambda item: (-item[1], item[0]))[:limit]
+
+    print("lazy-imports-lite: executed lazy references per function", file=file)
+    for (module, function), count in ranked(functions.items()):
+        print(f"{count:10}  {module}:{function}", file=file)
+
+    print("lazy-imports-lite: executed lazy references per name", file=file)
+    for (module, function, name), count in ranked(counts.items()):
+        print(f"{count:10}  {module}:{function}  {name}", file=file)
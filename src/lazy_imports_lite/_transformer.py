@@ -1,29 +1,289 @@
 import ast
+import importlib.util
+import os
 import typing
 from typing import Any
 
+from ._config import matches
+
+# has to be increased every time the generated code changes
+TRANSFORMER_VERSION = 11
+
+# options of TransformModuleImports which can be enabled with environment
+# variables
+option_variables = {
+    "hoist_loops": "LAZY_IMPORTS_LITE_HOIST_LOOPS",
+    "hoist_function_imports": "LAZY_IMPORTS_LITE_HOIST_FUNCTION_IMPORTS",
+    "probe_imports": "LAZY_IMPORTS_LITE_PROBE_IMPORTS",
+}
+
+
+def transformer_options():
+    return tuple(
+        option
+        for option, variable in option_variables.items()
+        if variable in os.environ
+    )
+
+
+pragma_pattern = r"#\s*lazy-imports-lite:\s*eager\b"
+
+
+def pragma_lines(source):
+    """The lines of `source` (bytes) with a `# lazy-imports-lite: eager`
+    comment."""
+    if b"lazy-imports-lite" not in source:
+        return frozenset()
+
+    # only imported for modules with a pragma (startup time)
+    import io
+    import re
+    import tokenize
+
+    return frozenset(
+        token.start[0]
+        for token in tokenize.tokenize(io.BytesIO(source).readline)
+        if token.type == tokenize.COMMENT and re.match(pragma_pattern, token.string)
+    )
+
+
 header = """
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals=__lazy_imports_lite__.make_globals(lambda g=globals:g())
 """
 header_ast = ast.parse(header).body
 
 
+# builtins which are replaced with the functions of the same name in _hooks
+builtin_hooks = ("globals", "eval", "exec")
+
+
+def hidden_name(name):
+    return f"__lazy_imports_lite_{name}__"
+
+
+def annotation_head(annotation):
+    """The first name of an annotation (`ClassVar[int]` -> `ClassVar`,
+    `typing.ClassVar` -> `typing`) or None."""
+    if isinstance(annotation, ast.Subscript):
+        annotation = annotation.value
+    while isinstance(annotation, ast.Attribute):
+        annotation = annotation.value
+    return annotation.id if isinstance(annotation, ast.Name) else None
+
+
+def hook(name):
+    return ast.Attribute(
+        value=ast.Name(id="__lazy_imports_lite__", ctx=ast.Load()),
+        attr=name,
+        ctx=ast.Load(),
+    )
+
+
+def module_imports(body, probe_imports=False):
+    """The imports in `body` which bind module globals."""
+    for node in body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            yield node
+        elif isinstance(node, ast.If):
+            yield from module_imports(node.body, probe_imports)
+            yield from module_imports(node.orelse, probe_imports)
+        elif isinstance(node, ast.With) and import_block(node) == "lazy":
+            yield from module_imports(node.body, probe_imports)
+        elif probe_imports and is_optional_import(node):
+            yield from module_imports(node.body, probe_imports)
+            yield from module_imports(node.orelse, probe_imports)
+            yield from module_imports(node.handlers[0].body, probe_imports)
+
+
+def import_block(node):
+    """ "eager" for `with eager_imports():`, "lazy" for `with lazy_imports():`
+    and None for all other statements."""
+    if not isinstance(node, ast.With) or len(node.items) != 1:
+        return None
+
+    call = node.items[0].context_expr
+    if not isinstance(call, ast.Call) or call.args or call.keywords:
+        return None
+
+    func = call.func
+    if isinstance(func, ast.Name):
+        name = func.id
+    elif (
+        isinstance(func, ast.Attribute)
+        and isinstance(func.value, ast.Name)
+        and func.value.id == "lazy_imports_lite"
+    ):
+        name = func.attr
+    else:
+        return None
+
+    return {"eager_imports": "eager", "lazy_imports": "lazy"}.get(name)
+
+
+def module_bindings(module):
+    """The names which are bound in the namespace of the module."""
+    names = set()
+    nodes = [module]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ast.Global):
+            names.update(node.names)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, ast.alias):
+            names.add((node.asname or node.name).split(".")[0])
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+            # only `global` statements bind module names in the bodies
+            nodes.extend(n for n in ast.walk(node) if isinstance(n, ast.Global))
+            continue
+        nodes.extend(ast.iter_child_nodes(node))
+    return names
+
+
+import_errors = {"ImportError", "ModuleNotFoundError"}
+
+
+def is_optional_import(node):
+    """`try: import x / except ImportError: ...`"""
+    if not isinstance(node, ast.Try) or node.finalbody:
+        return False
+
+    for statement in node.body:
+        if not isinstance(statement, (ast.Import, ast.ImportFrom)):
+            return False
+        if isinstance(statement, ast.ImportFrom) and (
+            statement.module == "__future__"
+            or any(alias.name == "*" for alias in statement.names)
+        ):
+            return False
+
+    for handler in node.handlers:
+        # the exception can not be bound without executing the import
+        if handler.name is not None or handler.type is None:
+            return False
+        if isinstance(handler.type, ast.Tuple):
+            types = handler.type.elts
+        else:
+            types = [handler.type]
+        if not types or not all(
+            isinstance(t, ast.Name) and t.id in import_errors for t in types
+        ):
+            return False
+
+    return True
+
+
 class TransformModuleImports(ast.NodeTransformer):
-    def __init__(self):
+    """Transforms the imports of a module into lazy objects (top-level
+    imports, imports in `if` statements and in class bodies).
+
+    Every use of an imported name is wrapped in `lazy_value()`. With
+    `rewrite_names=False` the uses are left unchanged, which generates the
+    plain code of the functions (see LazyGlobals).
+
+    With `hoist_loops=True` the imported names which are used inside of loops
+    are resolved once per function call and stored in hidden local variables.
+
+    With `hoist_function_imports=True` the imports inside of functions are
+    transformed into lazy objects in hidden globals, which are resolved when
+    the import statement is executed for the first time.
+
+    Imports inside of `with eager_imports():` are never transformed and the
+    imports inside of `with lazy_imports():` are always transformed.
+
+    The imports in `eager_lines` (lines with a pragma comment) and the imports
+    of the modules which match the patterns in `eager_modules` are never
+    transformed. `package` is used to resolve relative imports.
+
+    With `probe_imports=True` the `try: import x / except ImportError: ...`
+    statements are transformed into an `if` which checks if the modules can be
+    found (see find_imports) and both branches bind lazy objects.
+
+    With `count_lazy_loads=True` every `lazy_value()` call counts how often it
+    is executed per function and name (see counted_lazy_value).
+    """
+
+    def __init__(
+        self,
+        rewrite_names=True,
+        hoist_loops=False,
+        hoist_function_imports=False,
+        probe_imports=False,
+        eager_lines=frozenset(),
+        eager_modules=(),
+        package=None,
+        count_lazy_loads=False,
+    ):
+        self.rewrite_names = rewrite_names
+        self.hoist_loops = hoist_loops
+        self.hoist_function_imports = hoist_function_imports
+        self.probe_imports = probe_imports
+        self.eager_lines = eager_lines
+        self.eager_modules = eager_modules
+        self.package = package
+        self.count_lazy_loads = count_lazy_loads
+        self.hoisted_imports = []
+        # the names which are imported in the bodies of the classes which are
+        # currently visited
+        self.class_imports = []
+        self.lazy_names = set()
+        # the builtins of builtin_hooks which are redefined by the module
+        self.redefined = set()
+        # `from __future__ import annotations` (the annotations are strings)
+        self.future_annotations = False
         self.transformed_imports = []
         self.functions = []
         self.context = []
 
+        # the qualified name of the current scope (like __qualname__)
+        self.scope = []
+        self.function_scopes = {}
+        self.current_scope = "<module>"
+
         self.globals = set()
         self.locals = set()
         self.in_function = False
 
+        # state of the loop hoisting for the current function
+        self.hoisting = False
+        self.loop_depth = 0
+        self.hoisted = []
+
+    def is_eager(self, node):
+        end_lineno = getattr(node, "end_lineno", None) or node.lineno
+        if not self.eager_lines.isdisjoint(range(node.lineno, end_lineno + 1)):
+            return True
+
+        if not self.eager_modules:
+            return False
+
+        if isinstance(node, ast.Import):
+            return any(matches(alias.name, self.eager_modules) for alias in node.names)
+
+        try:
+            module = importlib.util.resolve_name(
+                "." * node.level + (node.module or ""), self.package
+            )
+        except (ImportError, ValueError):
+            return False
+
+        return matches(module, self.eager_modules) or any(
+            matches(f"{module}.{alias.name}", self.eager_modules)
+            for alias in node.names
+        )
+
     def visit_ImportFrom(self, node: ast.ImportFrom) -> Any:
-        if self.context[-1] != "Module":
+        if node.module == "__future__" or self.is_eager(node):
+            return node
+
+        if node.names[0].name == "*":
+            # the names which are bound are only known after the import
             return node
 
-        if node.module == "__future__":
+        hoist = self.can_hoist_import()
+        scope = self.import_scope()
+        if scope is None and not hoist:
             return node
 
         new_nodes = []
@@ -49,11 +309,19 @@ class TransformModuleImports(ast.NodeTransformer):
                     ),
                 )
             )
-            self.transformed_imports.append(name)
-        return new_nodes
+
+        if hoist:
+            return self.hoist_imports(node, new_nodes)
+
+        return self.bind_imports(scope, new_nodes)
 
     def visit_Import(self, node: ast.Import) -> Any:
-        if len(self.context) > 1:
+        if self.is_eager(node):
+            return node
+
+        hoist = self.can_hoist_import()
+        scope = self.import_scope()
+        if scope is None and not hoist:
             return node
 
         new_nodes = []
@@ -76,7 +344,6 @@ class TransformModuleImports(ast.NodeTransformer):
                         ),
                     )
                 )
-                self.transformed_imports.append(name)
             else:
                 name = alias.name.split(".")[0]
                 new_nodes.append(
@@ -95,10 +362,128 @@ class TransformModuleImports(ast.NodeTransformer):
                         ),
                     )
                 )
-                self.transformed_imports.append(name)
 
+        if hoist:
+            return self.hoist_imports(node, new_nodes)
+
+        return self.bind_imports(scope, new_nodes)
+
+    def import_scope(self):
+        """The namespace ("module" or "class") of the names which are bound by
+        an import in the current context or None if the import can not be
+        deferred.
+
+        Imports in `if` statements are deferred like all other imports. The
+        import is never executed if the name is not used (`if TYPE_CHECKING:`).
+        """
+        if not self.context or self.context[0] != "Module":
+            return None
+
+        scopes = {c for c in self.context[1:] if c not in ("If", "LazyImports")}
+        if not scopes:
+            return "module"
+        if scopes == {"ClassDef"}:
+            return "class"
+        return None
+
+    def bind_imports(self, scope, assignments):
+        names = [assignment.targets[0].id for assignment in assignments]
+        if scope == "class":
+            self.class_imports[-1].update(names)
+        else:
+            self.transformed_imports.extend(names)
+        return assignments
+
+    def is_class_import(self, name):
+        return bool(self.class_imports) and name in self.class_imports[-1]
+
+    def can_hoist_import(self):
+        # the names of imports in class bodies are no local variables
+        return (
+            (self.hoist_function_imports or "LazyImports" in self.context)
+            and self.in_function
+            and "ClassDef" not in self.context
+            and "EagerImports" not in self.context
+        )
+
+    def hoist_imports(self, node, assignments):
+        """Moves the lazy objects of an import inside of a function into hidden
+        globals and assigns their values to the imported names."""
+        new_nodes = []
+        for assignment in assignments:
+            name = assignment.targets[0].id
+            hidden = hidden_name(str(len(self.hoisted_imports)))
+
+            assignment.targets = [ast.Name(id=hidden, ctx=ast.Store())]
+            self.hoisted_imports.append(assignment)
+
+            value = ast.Name(id=hidden, ctx=ast.Load())
+            if self.rewrite_names:
+                value = ast.Call(func=hook("local_import"), args=[value], keywords=[])
+
+            if name not in self.globals:
+                self.locals.add(name)
+            new_nodes.append(
+                ast.copy_location(
+                    ast.Assign(
+                        targets=[ast.Name(id=name, ctx=ast.Store())], value=value
+                    ),
+                    node,
+                )
+            )
         return new_nodes
 
+    def visit_Try(self, node: ast.Try) -> Any:
+        if (
+            not self.probe_imports
+            or self.import_scope() is None
+            or not is_optional_import(node)
+            or any(self.is_eager(statement) for statement in node.body)
+        ):
+            return self.generic_visit(node)
+
+        imports: typing.List[typing.Tuple[str, ...]] = []
+        for statement in node.body:
+            if isinstance(statement, ast.Import):
+                imports += [(alias.name,) for alias in statement.names]
+            elif isinstance(statement, ast.ImportFrom):
+                module = "." * statement.level + (statement.module or "")
+                imports += [(module, alias.name) for alias in statement.names]
+
+        # tuples are valid constants, but the stubs of ast do not allow them
+        constants: typing.List[ast.expr] = [
+            ast.Constant(value=i, kind=None) for i in imports  # type: ignore[arg-type]
+        ]
+
+        probe = ast.If(
+            test=ast.Call(
+                func=hook("find_imports"),
+                args=[
+                    ast.Name(id="__package__", ctx=ast.Load()),
+                    *constants,
+                ],
+                keywords=[],
+            ),
+            body=node.body + node.orelse,
+            # only the first handler can be executed
+            orelse=node.handlers[0].body,
+        )
+        return self.visit(ast.copy_location(probe, node))
+
+    def visit_With(self, node: ast.With) -> Any:
+        block = import_block(node)
+        if block is None:
+            return self.generic_visit(node)
+
+        # the imports in `with eager_imports():` are not transformed and the
+        # imports in `with lazy_imports():` are transformed like the imports
+        # in `if` statements (or hoisted in functions)
+        ctx_len = len(self.context)
+        self.context.append("EagerImports" if block == "eager" else "LazyImports")
+        result = super().generic_visit(node)
+        self.context = self.context[:ctx_len]
+        return result
+
     def visit_FunctionDef(self, node: ast.FunctionDef) -> Any:
         return self.handle_function(node)
 
@@ -109,13 +494,32 @@ class TransformModuleImports(ast.NodeTransformer):
         return self.handle_function(node)
 
     def handle_function(self, function):
+        uses_lazy_names = any(
+            (isinstance(node, ast.Name) and node.id in self.lazy_names)
+            or (
+                self.hoist_function_imports
+                and isinstance(node, (ast.Import, ast.ImportFrom))
+                and getattr(node, "module", None) != "__future__"
+            )
+            or import_block(node) == "lazy"
+            for node in ast.walk(function)
+        )
+
         for field, value in ast.iter_fields(function):
-            if field != "body":
+            if field != "body" and not (field == "returns" and self.future_annotations):
                 if isinstance(value, list):
                     setattr(function, field, [self.visit(item) for item in value])
                 elif isinstance(value, ast.AST):
                     setattr(function, field, self.visit(value))
         self.functions.append(function)
+        name = "<lambda>" if isinstance(function, ast.Lambda) else function.name
+        self.function_scopes[function] = [*self.scope, name]
+
+        if uses_lazy_names and not self.in_function:
+            # the function is created when the module is executed
+            if isinstance(function, ast.Lambda):
+                return ast.Call(func=hook("track"), args=[function], keywords=[])
+            function.decorator_list.append(hook("track"))
 
         return function
 
@@ -130,15 +534,171 @@ class TransformModuleImports(ast.NodeTransformer):
 
         self.locals = {arg.arg for arg in args if arg is not None}
 
+        scope = self.function_scopes.pop(function)
+        self.scope = [*scope, "<locals>"]
+        self.current_scope = ".".join(scope)
+
         self.globals = set()
 
         self.in_function = True
 
+        # the hidden variables can not be initialized in a lambda
+        self.hoisting = self.hoist_loops and isinstance(function.body, list)
+        self.loop_depth = 0
+        self.hoisted = []
+
         if isinstance(function.body, list):
-            function.body = [self.visit(b) for b in function.body]
+            body = []
+            for statement in function.body:
+                new_statement = self.visit(statement)
+                if isinstance(new_statement, list):
+                    body.extend(new_statement)
+                else:
+                    body.append(new_statement)
+
+            if self.hoisted:
+                pos = 1 if ast.get_docstring(function, clean=False) is not None else 0
+                body[pos:pos] = [
+                    ast.Assign(
+                        targets=[ast.Name(id=hidden_name(name), ctx=ast.Store())],
+                        value=ast.Constant(value=None, kind=None),
+                    )
+                    for name in self.hoisted
+                ]
+
+            function.body = body
         else:
             function.body = self.visit(function.body)
 
+        self.hoisting = False
+
+    def in_loop(self, node, fields):
+        """Visits `node` like generic_visit, the `fields` are evaluated for
+        every iteration of a loop."""
+        ctx_len = len(self.context)
+        self.context.append(type(node).__name__)
+        for field in node._fields:
+            if field in fields:
+                self.loop_depth += 1
+            self.visit_field(node, field)
+            if field in fields:
+                self.loop_depth -= 1
+        self.context = self.context[:ctx_len]
+        return node
+
+    def visit_field(self, node, field):
+        value = getattr(node, field, None)
+        if isinstance(value, list):
+            new_value = []
+            for item in value:
+                new_item = self.visit(item) if isinstance(item, ast.AST) else item
+                if isinstance(new_item, list):
+                    new_value.extend(new_item)
+                elif new_item is not None:
+                    new_value.append(new_item)
+            setattr(node, field, new_value)
+        elif isinstance(value, ast.AST):
+            setattr(node, field, self.visit(value))
+
+    def visit_For(self, node: ast.For) -> Any:
+        return self.in_loop(node, ("body",))
+
+    def visit_AsyncFor(self, node: ast.AsyncFor) -> Any:
+        return self.in_loop(node, ("body",))
+
+    def visit_While(self, node: ast.While) -> Any:
+        return self.in_loop(node, ("test", "body"))
+
+    def visit_ListComp(self, node: ast.ListComp) -> Any:
+        return self.handle_comprehension(node, ("elt",))
+
+    def visit_SetComp(self, node: ast.SetComp) -> Any:
+        return self.handle_comprehension(node, ("elt",))
+
+    def visit_GeneratorExp(self, node: ast.GeneratorExp) -> Any:
+        return self.handle_comprehension(node, ("elt",))
+
+    def visit_DictComp(self, node: ast.DictComp) -> Any:
+        return self.handle_comprehension(node, ("key", "value"))
+
+    def handle_comprehension(self, node, fields):
+        ctx_len = len(self.context)
+        self.context.append(type(node).__name__)
+        for generator in node.generators:
+            self.visit_field(generator, "target")
+            # assignment expressions are not allowed in the iterable of a
+            # comprehension
+            hoisting, self.hoisting = self.hoisting, False
+            self.visit_field(generator, "iter")
+            self.hoisting = hoisting
+            self.loop_depth += 1
+            self.visit_field(generator, "ifs")
+            self.loop_depth -= 1
+
+        self.loop_depth += 1
+        for field in fields:
+            self.visit_field(node, field)
+        self.loop_depth -= 1
+        self.context = self.context[:ctx_len]
+        return node
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> Any:
+        # a class body has its own namespace
+        hoisting, self.hoisting = self.hoisting, False
+        current_scope = self.current_scope
+        self.scope.append(node.name)
+        self.current_scope = ".".join(self.scope)
+        self.class_imports.append(set())
+        result = self.generic_visit(node)
+        if self.future_annotations:
+            self.resolve_type_qualifiers(node)
+        self.class_imports.pop()
+        self.scope.pop()
+        self.current_scope = current_scope
+        self.hoisting = hoisting
+        return result
+
+    def resolve_type_qualifiers(self, node):
+        """`dataclasses` looks up the first names of the string annotations in
+        the module dict to find `ClassVar` and `InitVar`, which have to be
+        resolved when the class is created."""
+        names = [
+            name
+            for statement in node.body
+            if isinstance(statement, ast.AnnAssign)
+            for name in [annotation_head(statement.annotation)]
+            if name in self.transformed_imports
+            and not self.is_class_import(name)
+            and (name not in self.locals or not self.in_function)
+        ]
+        if names:
+            node.body.append(
+                ast.Expr(
+                    value=ast.Call(
+                        func=hook("type_qualifiers"),
+                        args=[ast.Constant(value=name, kind=None) for name in names],
+                        keywords=[],
+                    )
+                )
+            )
+
+    def visit_arg(self, node: ast.arg) -> Any:
+        if self.future_annotations:
+            # the annotations are not evaluated
+            return node
+        return self.generic_visit(node)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> Any:
+        if not self.future_annotations:
+            return self.generic_visit(node)
+
+        ctx_len = len(self.context)
+        self.context.append(type(node).__name__)
+        self.visit_field(node, "target")
+        self.visit_field(node, "value")
+        self.context = self.context[:ctx_len]
+        return node
+
     def visit_Global(self, node: ast.Global) -> Any:
         self.globals.update(node.names)
         return self.generic_visit(node)
@@ -149,14 +709,103 @@ class TransformModuleImports(ast.NodeTransformer):
         ):
             self.locals.add(node.id)
 
-        if node.id in self.transformed_imports and node.id not in self.locals:
-            old_ctx = node.ctx
-            node.ctx = ast.Load()
-            return ast.Attribute(value=node, attr="_lazy_value", ctx=old_ctx)
+        if (
+            isinstance(node.ctx, ast.Load)
+            and node.id in builtin_hooks
+            and node.id not in self.locals
+            and node.id not in self.redefined
+        ):
+            # globals() hides the lazy objects, eval() and exec() resolve them
+            return ast.copy_location(hook(node.id), node)
+
+        if isinstance(node.ctx, ast.Load) and self.is_class_import(node.id):
+            return self.lazy_value(node)
+
+        if (
+            isinstance(node.ctx, ast.Load)
+            and node.id in self.transformed_imports
+            and (node.id not in self.locals or not self.in_function)
+        ):
+            if self.hoisting and self.loop_depth and node.id not in self.globals:
+                return self.hoisted_value(node)
+            return self.lazy_value(node)
         else:
             return node
 
+    def hoisted_value(self, node):
+        """`hidden if hidden is not None else (hidden := lazy_value(name))`"""
+        if not self.rewrite_names:
+            return node
+
+        if node.id not in self.hoisted:
+            self.hoisted.append(node.id)
+        hidden = hidden_name(node.id)
+
+        return ast.IfExp(
+            test=ast.Compare(
+                left=ast.Name(id=hidden, ctx=ast.Load()),
+                ops=[ast.IsNot()],
+                comparators=[ast.Constant(value=None, kind=None)],
+            ),
+            body=ast.Name(id=hidden, ctx=ast.Load()),
+            orelse=ast.NamedExpr(
+                target=ast.Name(id=hidden, ctx=ast.Store()),
+                value=self.lazy_value(node),
+            ),
+        )
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> Any:
+        target = node.target
+        if (
+            self.rewrite_names
+            and isinstance(target, ast.Name)
+            and (
+                target.id in self.transformed_imports
+                and (target.id not in self.locals or not self.in_function)
+                or self.is_class_import(target.id)
+            )
+        ):
+            # `x += 1` has to resolve the lazy object first
+            resolve = ast.Assign(
+                targets=[ast.Name(id=target.id, ctx=ast.Store())],
+                value=self.lazy_value(ast.Name(id=target.id, ctx=ast.Load())),
+            )
+            return [resolve, self.generic_visit(node)]
+        return self.generic_visit(node)
+
+    def lazy_value(self, node):
+        if not self.rewrite_names:
+            return node
+        if self.count_lazy_loads:
+            return ast.Call(
+                func=hook("counted_lazy_value"),
+                args=[
+                    node,
+                    ast.Name(id="__name__", ctx=ast.Load()),
+                    ast.Constant(value=self.current_scope, kind=None),
+                    ast.Constant(value=node.id, kind=None),
+                ],
+                keywords=[],
+            )
+        return ast.Call(func=hook("lazy_value"), args=[node], keywords=[])
+
     def visit_Module(self, module: ast.Module) -> Any:
+        self.redefined = set(builtin_hooks) & module_bindings(module)
+        self.future_annotations = any(
+            isinstance(node, ast.ImportFrom)
+            and node.module == "__future__"
+            and any(alias.name == "annotations" for alias in node.names)
+            for node in module.body
+        )
+
+        for node in module_imports(module.body, self.probe_imports):
+            if isinstance(node, ast.ImportFrom) and node.module != "__future__":
+                self.lazy_names.update(a.asname or a.name for a in node.names)
+            elif isinstance(node, ast.Import):
+                self.lazy_names.update(
+                    a.asname or a.name.split(".")[0] for a in node.names
+                )
+
         module = typing.cast(ast.Module, self.generic_visit(module))
         assert len(self.context) == 0
 
@@ -181,6 +830,9 @@ class TransformModuleImports(ast.NodeTransformer):
             f = self.functions.pop()
             self.handle_function_body(f)
 
+        pos += len(header_ast)
+        module.body[pos:pos] = self.hoisted_imports
+
         return module
 
     def generic_visit(self, node: ast.AST) -> ast.AST:
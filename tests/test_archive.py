@@ -0,0 +1,133 @@
+import marshal
+import os
+import subprocess as sp
+import sys
+
+from inline_snapshot import snapshot
+from lazy_imports_lite import _loader
+from lazy_imports_lite._archive import archive_path
+from lazy_imports_lite._archive import open_archive
+from lazy_imports_lite._archive import write_archive
+
+from .test_loader import package
+
+
+def make_archive(tmp_path):
+    pck = tmp_path / "pck"
+    (pck / "sub").mkdir(parents=True)
+    record = tmp_path / "RECORD"
+    record.write_text("")
+
+    modules = {
+        "__init__.py": compile("x=1", str(pck / "__init__.py"), "exec"),
+        "sub/__init__.py": compile("x=2", str(pck / "sub/__init__.py"), "exec"),
+        "sub/m.py": "uses eval/exec",
+    }
+    write_archive(
+        str(pck), str(record), {k: marshal.dumps(v) for k, v in modules.items()}
+    )
+    return pck, record
+
+
+def test_archive(tmp_path):
+    pck, record = make_archive(tmp_path)
+
+    archive = open_archive(str(pck))
+    assert archive.get("__init__.py").co_filename == str(pck / "__init__.py")
+    assert archive.get("sub/__init__.py").co_filename == str(pck / "sub/__init__.py")
+    assert archive.get("sub/m.py") == "uses eval/exec"
+    assert archive.get("missing.py") is None
+
+
+def test_edited_module(tmp_path):
+    pck = tmp_path / "pck"
+    pck.mkdir()
+    record = tmp_path / "RECORD"
+    record.write_text("")
+    (pck / "m.py").write_text("x=1")
+    (pck / "other.py").write_text("x=2")
+
+    modules = {name: marshal.dumps(f"code of {name}") for name in ("m.py", "other.py")}
+    write_archive(str(pck), str(record), modules)
+
+    stat = os.stat(pck / "m.py")
+    (pck / "m.py").write_text("x=3")
+    os.utime(pck / "m.py", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    # the edited module is loaded from its source
+    archive = open_archive(str(pck))
+    assert archive.get("m.py") is None
+    assert archive.get("other.py") == "code of other.py"
+
+
+def test_outdated_archive(tmp_path):
+    pck, record = make_archive(tmp_path)
+
+    # the distribution was reinstalled
+    record.write_text("changed")
+    assert open_archive(str(pck)) is None
+
+
+def test_invalid_archive(tmp_path):
+    assert open_archive(str(tmp_path)) is None
+
+    path = archive_path(str(tmp_path))
+    os.makedirs(os.path.dirname(path))
+    for content in (b"", b"garbage", b"garbage but longer"):
+        with open(path, "wb") as f:
+            f.write(content)
+        assert open_archive(str(tmp_path)) is None
+
+
+def test_archived_code(tmp_path, monkeypatch):
+    pck, record = make_archive(tmp_path)
+    monkeypatch.setattr(_loader, "archives", {})
+
+    def code(fullname, path):
+        return _loader.archived_code("pck", fullname, str(path))
+
+    assert code("pck", pck / "__init__.py").co_filename.endswith("__init__.py")
+    assert code("pck.sub", pck / "sub" / "__init__.py") is not None
+    assert code("pck.sub.m", pck / "sub" / "m.py") == "uses eval/exec"
+    assert code("pck.other", pck / "other.py") is None
+
+    assert _loader.archived_code("mod", "mod", str(tmp_path / "mod.py")) is None
+
+
+def test_cli_compile_archive():
+    with package(
+        "test_pck",
+        {
+            "test_pck/__init__.py": "from .a import x",
+            "test_pck/a.py": "x=5",
+        },
+    ):
+        result = sp.run(
+            ["lazy-imports-lite", "compile", "--archive"], capture_output=True
+        )
+        assert result.returncode == 0
+        assert result.stderr.decode() == ""
+        lines = result.stdout.decode().splitlines()
+        assert lines[-1] == snapshot("compiled 2 modules, skipped 0, errors 0")
+        assert "__lazy_imports_lite__" in lines[0]
+
+        result = sp.run(
+            [
+                sys.executable,
+                "-c",
+                "import test_pck;"
+                "from lazy_imports_lite._loader import archives;"
+                "print(test_pck.x, [sorted(a.entries) for a in archives.values()])",
+            ],
+            capture_output=True,
+        )
+        assert result.stdout.decode().strip() == snapshot("5 [['__init__.py', 'a.py']]")
+
+
+def test_cli_compile_archive_paths(tmp_path):
+    result = sp.run(
+        ["lazy-imports-lite", "compile", "--archive", str(tmp_path)],
+        capture_output=True,
+    )
+    assert result.returncode == 2
+    assert "--archive can only be used for distributions" in result.stderr.decode()
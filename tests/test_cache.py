@@ -0,0 +1,122 @@
+import os
+import shutil
+import sys
+
+import pytest
+from lazy_imports_lite._cache import cache_path
+from lazy_imports_lite._loader import get_code
+
+
+@pytest.fixture(autouse=True)
+def write_bytecode(monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+
+
+def test_cache(tmp_path):
+    module = tmp_path / "module.py"
+    module.write_text("from x import y\n")
+
+    code = get_code(str(module))[0]
+    cache_file = cache_path(str(module))
+    assert os.path.exists(cache_file)
+    assert "__pycache__" in cache_file
+    assert "ImportFrom" in code.co_names
+
+    assert get_code(str(module))[0].co_names == code.co_names
+
+    # the cache is used as long as the source does not change
+    with open(cache_file, "rb") as f:
+        data = f.read()
+    stat = os.stat(module)
+    os.utime(cache_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert get_code(str(module))[0].co_names == code.co_names
+    with open(cache_file, "rb") as f:
+        assert f.read() == data
+
+    module.write_text("x=5\n")
+    os.utime(module, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert "ImportFrom" not in get_code(str(module))[0].co_names
+
+
+def test_moved_cache(tmp_path):
+    module = tmp_path / "old" / "module.py"
+    module.parent.mkdir()
+    module.write_text("from x import y\ndef f():\n    return y\n")
+    get_code(str(module))
+
+    # the copy keeps the mtimes and the cache file
+    shutil.copytree(tmp_path / "old", tmp_path / "new")
+    moved = str(tmp_path / "new" / "module.py")
+    with open(cache_path(moved), "rb") as f:
+        data = f.read()
+
+    code, plain_code, _ = get_code(moved)
+    with open(cache_path(moved), "rb") as f:
+        assert f.read() == data
+
+    functions = [c for c in code.co_consts if hasattr(c, "co_filename")]
+    assert {c.co_filename for c in [code, plain_code, *functions]} == {moved}
+
+
+def test_cache_eval(tmp_path):
+    module = tmp_path / "module.py"
+    module.write_text("import builtins\nbuiltins.eval('5')\n")
+
+    reason = "uses builtins.eval() with the module globals (line 2)"
+    assert get_code(str(module)) == reason
+    assert get_code(str(module)) == reason
+
+    module.write_text("eval('5')\n")
+    assert "eval" in get_code(str(module))[0].co_names
+
+
+def test_cache_options(tmp_path, monkeypatch):
+    module = tmp_path / "module.py"
+    module.write_text("from x import y\ndef f():\n    for i in y:\n        print(y)\n")
+
+    def function_locals():
+        code = get_code(str(module))[0]
+        return next(
+            c for c in code.co_consts if getattr(c, "co_name", "") == "f"
+        ).co_varnames
+
+    assert function_locals() == ("i",)
+
+    monkeypatch.setenv("LAZY_IMPORTS_LITE_HOIST_LOOPS", "1")
+    assert function_locals() == ("__lazy_imports_lite_y__", "i")
+
+    monkeypatch.delenv("LAZY_IMPORTS_LITE_HOIST_LOOPS")
+    assert function_locals() == ("i",)
+
+
+def test_invalid_cache(tmp_path):
+    module = tmp_path / "module.py"
+    module.write_text("from x import y\n")
+    cache_file = cache_path(str(module))
+
+    os.makedirs(os.path.dirname(cache_file))
+    for content in (b"", b"garbage", b"garbage but longer"):
+        with open(cache_file, "wb") as f:
+            f.write(content)
+
+        assert "ImportFrom" in get_code(str(module))[0].co_names
+
+
+def test_unwritable_cache(tmp_path):
+    module = tmp_path / "module.py"
+    module.write_text("from x import y\n")
+
+    # __pycache__ can not be created
+    (tmp_path / "__pycache__").write_text("")
+
+    assert "ImportFrom" in get_code(str(module))[0].co_names
+
+
+def test_dont_write_bytecode(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+
+    module = tmp_path / "module.py"
+    module.write_text("from x import y\n")
+
+    assert "ImportFrom" in get_code(str(module))[0].co_names
+    assert not os.path.exists(cache_path(str(module)))
@@ -1,8 +1,24 @@
+import importlib.machinery
+import os
 import subprocess as sp
 import sys
 
 import pytest
 from inline_snapshot import snapshot
+from lazy_imports_lite import _loader
+from lazy_imports_lite.__main__ import compile_modules
+from lazy_imports_lite._cache import cache_path
+
+from .test_loader import package
+
+
+def module_origin(name):
+    # the module is not imported, because the tests install different
+    # packages with the same name
+    importlib.invalidate_caches()
+    spec = importlib.machinery.PathFinder.find_spec(name)
+    assert spec is not None and spec.origin is not None
+    return spec.origin
 
 
 @pytest.mark.skipif(sys.version_info < (3, 9), reason="3.8 unparses differently")
@@ -24,12 +40,12 @@ def f():
     assert result.stdout.decode().replace("\r\n", "\n") == snapshot(
         """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 bar = __lazy_imports_lite__.ImportFrom(__package__, 'foo', 'bar')
 
+@__lazy_imports_lite__.track
 def f():
-    print(bar._lazy_value())
-    print(bar._lazy_value())
+    print(__lazy_imports_lite__.lazy_value(bar)())
+    print(__lazy_imports_lite__.lazy_value(bar)())
 """
     )
 
@@ -43,3 +59,188 @@ def test_cli_invalid_args():
 Error: Please specify a valid subcommand. Use 'preview --help' for more information.
 """
     )
+
+
+def test_cli_compile(tmp_path):
+    pck = tmp_path / "pck"
+    pck.mkdir()
+    (pck / "__init__.py").write_text("from .a import x")
+    (pck / "a.py").write_text("import builtins\nx=builtins.eval('5')")
+    (pck / "ext.so").write_text("")
+    (pck / "data.txt").write_text("")
+
+    result = sp.run(
+        ["lazy-imports-lite", "compile", "-j", "2", str(pck)],
+        capture_output=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    assert result.returncode == 0
+    assert result.stdout.decode().replace("\r\n", "\n").replace(
+        str(tmp_path), "<tmp>"
+    ).replace(os.sep, "/") == snapshot(
+        """\
+skipped <tmp>/pck/a.py: uses builtins.eval() with the module globals (line 2)
+skipped <tmp>/pck/ext.so: not a .py file
+compiled 1 modules, skipped 2, errors 0
+"""
+    )
+    assert result.stderr.decode() == ""
+
+    assert os.path.exists(cache_path(str(pck / "__init__.py")))
+    assert os.path.exists(cache_path(str(pck / "a.py")))
+
+
+def test_cli_compile_error(tmp_path):
+    (tmp_path / "a.py").write_text("def (")
+
+    result = sp.run(
+        ["lazy-imports-lite", "compile", "-q", str(tmp_path)], capture_output=True
+    )
+    assert result.returncode == 1
+    assert result.stdout.decode().replace("\r\n", "\n") == snapshot(
+        """\
+compiled 0 modules, skipped 0, errors 1
+"""
+    )
+    assert "SyntaxError" in result.stderr.decode()
+
+
+def test_cli_compile_distributions():
+    with package("test_pck", {"test_pck/__init__.py": "import os"}):
+        result = sp.run(["lazy-imports-lite", "compile"], capture_output=True)
+        assert result.returncode == 0
+        assert result.stdout.decode().replace("\r\n", "\n") == snapshot(
+            """\
+compiled 1 modules, skipped 0, errors 0
+"""
+        )
+
+        assert os.path.exists(cache_path(module_origin("test_pck")))
+
+
+def test_cli_compile_registry(tmp_path, monkeypatch):
+    path = tmp_path / "registry"
+    monkeypatch.setattr(_loader, "registry_path", lambda: str(path))
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+
+    assert compile_modules([], workers=1, quiet=True) == 0
+    assert path.exists()
+
+
+def test_cli_run(tmp_path):
+    script = tmp_path / "script.py"
+    script.write_text(
+        """\
+import sys
+import test_pck
+from test_pck.a import a
+
+print("main", sys.argv[1:], "test_pck.a" in sys.modules)
+print(test_pck.__name__, "test_pck.b" in sys.modules)
+"""
+    )
+
+    with package(
+        "test_pck",
+        {
+            "test_pck/__init__.py": "import test_pck.b",
+            "test_pck/a.py": "a = 1",
+            "test_pck/b.py": "",
+        },
+        lazy_imports_enabled=False,
+    ):
+
+        def run(*args, **env):
+            result = sp.run(
+                ["lazy-imports-lite", "run", *args],
+                cwd=str(tmp_path),
+                env={**os.environ, **env},
+                capture_output=True,
+            )
+            assert result.stderr.decode() == ""
+            return result.stdout.decode().replace("\r\n", "\n")
+
+        assert run("script.py", "x") == snapshot(
+            """\
+main ['x'] False
+test_pck True
+"""
+        )
+        assert run("-p", "test_pck", "script.py", "x") == snapshot(
+            """\
+main ['x'] False
+test_pck False
+"""
+        )
+        assert run(
+            "script.py", LAZY_IMPORTS_LITE_PACKAGES="other, test_pck"
+        ) == snapshot(
+            """\
+main [] False
+test_pck False
+"""
+        )
+        assert run("-m", "script", LAZY_IMPORTS_LITE_DISABLE="1") == snapshot(
+            """\
+main [] True
+test_pck True
+"""
+        )
+
+
+def test_cli_run_configuration(tmp_path):
+    with package(
+        "test_pck",
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/__main__.py": """\
+import sys
+import test_pck.a
+import test_pck.b
+from . import c
+
+def loaded():
+    return sorted(m for m in sys.modules if m.startswith("test_pck."))
+
+print(loaded())
+""",
+            "test_pck/legacy.py": """\
+import sys
+import test_pck.a
+
+print(sorted(m for m in sys.modules if m.startswith("test_pck.")))
+""",
+            "test_pck/a.py": "",
+            "test_pck/b.py": "",
+            "test_pck/c.py": "",
+        },
+        extra_config="""
+[tool.lazy-imports-lite]
+exclude = ["test_pck.legacy"]
+eager = ["test_pck.b"]
+""",
+    ):
+        main_path = os.path.join(
+            os.path.dirname(module_origin("test_pck")), "__main__.py"
+        )
+
+        def run(*args):
+            result = sp.run(
+                ["lazy-imports-lite", "run", *args],
+                cwd=str(tmp_path),
+                capture_output=True,
+            )
+            assert result.stderr.decode() == ""
+            return result.stdout.decode().replace("\r\n", "\n")
+
+        assert run("-m", "test_pck") == snapshot("['test_pck.b']\n")
+        cache_stat = os.stat(cache_path(main_path))
+
+        assert run("-m", "test_pck") == snapshot("['test_pck.b']\n")
+        # the module is not transformed again
+        assert os.stat(cache_path(main_path)).st_mtime_ns == cache_stat.st_mtime_ns
+
+        assert run("-m", "test_pck.legacy") == snapshot("['test_pck.a']\n")
+        # scripts in the package use the configuration too
+        legacy_path = os.path.join(os.path.dirname(main_path), "legacy.py")
+        assert run(legacy_path) == snapshot("['test_pck.a']\n")
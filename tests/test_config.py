@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+from lazy_imports_lite._config import default_config
+from lazy_imports_lite._config import keyword_config
+from lazy_imports_lite._config import read_config
+
+
+def test_read_config(tmp_path):
+    path = tmp_path / "pyproject.toml"
+
+    path.write_text("[project]\nname = 'pkg'\n")
+    assert read_config(path) is None
+
+    path.write_text("[tool.lazy-imports-lite]\nexclude = 'pkg.legacy'\n")
+    assert read_config(path) == (("*",), ("pkg.legacy",), ())
+
+
+def test_read_config_errors(tmp_path):
+    path = tmp_path / "pyproject.toml"
+
+    path.write_text("[tool.lazy-imports-lite]\ninclude = 1\neager = ['pkg.x']\n")
+    with pytest.warns(UserWarning, match="include in .* has to be a list"):
+        assert read_config(path) == (("*",), (), ("pkg.x",))
+
+    path.write_text("[tool.lazy-imports-lite\n")
+    with pytest.warns(UserWarning, match="can not read the configuration"):
+        assert read_config(path) is None
+
+
+def dist(keywords):
+    return SimpleNamespace(metadata={"Name": "pkg", "Keywords": keywords})
+
+
+def test_keyword_config():
+    assert keyword_config(dist(None)) is None
+    assert keyword_config(dist("lazy-imports-lite-enabled,other")) is None
+
+    assert keyword_config(
+        dist(
+            "lazy-imports-lite-enabled,lazy-imports-lite-exclude=pkg.legacy,"
+            "lazy-imports-lite-eager=pkg.x,lazy-imports-lite-eager=pkg.y"
+        )
+    ) == (default_config[0], ("pkg.legacy",), ("pkg.x", "pkg.y"))
+
+    with pytest.warns(UserWarning, match="unknown keyword 'lazy-imports-lite-lazy'"):
+        assert keyword_config(dist("lazy-imports-lite-lazy")) is None
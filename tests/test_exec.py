@@ -29,3 +29,90 @@ some text
         ),
         normal_stderr=snapshot(""),
     )
+
+
+def test_eval_globals():
+    check_script(
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/a.py": "a='some text'",
+            "test_pck/b.py": """
+from .a import a
+
+def test(x):
+    return eval("a + x")
+
+def test_exec():
+    exec("global b; b = a.upper()")
+    exec("c = a.title()", globals())
+    return b, c, eval("b", {"b": "explicit"})
+""",
+        },
+        """
+import sys
+from test_pck import b
+
+print("test_pck.a" in sys.modules)
+print(b.test("!"))
+print(b.test_exec())
+""",
+        transformed_stdout=snapshot(
+            """\
+False
+some text!
+('SOME TEXT', 'Some Text', 'explicit')
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+True
+some text!
+('SOME TEXT', 'Some Text', 'explicit')
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_eval_resolved_globals():
+    check_script(
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/a.py": "a='some text'",
+            "test_pck/b.py": """
+from .a import a
+
+def test():
+    return eval("a")
+""",
+        },
+        """
+from lazy_imports_lite._hooks import lazy_globals
+from test_pck import b
+
+def resolved():
+    state = lazy_globals.get("test_pck.b")
+    return state is None or state.resolved
+
+print(resolved())
+print(b.test(), resolved())
+print(b.test(), resolved())
+""",
+        transformed_stdout=snapshot(
+            """\
+False
+some text True
+some text True
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+True
+some text True
+some text True
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
@@ -22,7 +22,10 @@ def write_files(dir, content):
 
 
 @contextmanager
-def package(name, content, extra_config="", lazy_imports_enabled=True):
+def package(
+    name, content, extra_config="", lazy_imports_enabled=True, keywords=(), wheel=False
+):
+    keywords = ["lazy-imports-lite-enabled"] * lazy_imports_enabled + list(keywords)
     content = {
         "pyproject.toml": f"""
 
@@ -32,7 +35,7 @@ build-backend = "hatchling.build"
 
 [project]
 name="{name}"
-keywords=[{'"lazy-imports-lite-enabled"' if lazy_imports_enabled else ""}]
+keywords={keywords!r}
 version="0.0.1"
 """
         + extra_config,
@@ -44,8 +47,20 @@ version="0.0.1"
 
         write_files(package_dir, content)
 
+        if wheel:
+            # the project directory is not known for installed wheels
+            wheel_dir = Path(d) / "dist"
+            subprocess.run(
+                [sys.executable, "-m", "pip", "wheel", "--no-deps"]
+                + ["-w", str(wheel_dir), str(package_dir)],
+                check=True,
+            )
+            target = str(next(wheel_dir.glob("*.whl")))
+        else:
+            target = str(package_dir)
+
         subprocess.run(
-            [sys.executable, "-m", "pip", "install", str(package_dir)],
+            [sys.executable, "-m", "pip", "install", target],
             input=b"y",
             check=True,
         )
@@ -329,10 +344,10 @@ test_pck.later()
         transformed_stdout=snapshot(
             """\
 inside dict_keys(['__name__', '__doc__', '__package__', '__loader__', '__spec__', '__path__', '__file__', '__cached__', '__builtins__', 'x'])
-mx <module 'test_pck.mx' from '<exec_prefix>/test_pck/mx.py'>
-inside dict_keys(['__name__', '__doc__', '__package__', '__loader__', '__spec__', '__path__', '__file__', '__cached__', '__builtins__', 'x', 'mx'])
-outside dict_keys(['__name__', '__doc__', '__package__', '__loader__', '__spec__', '__path__', '__file__', '__cached__', '__builtins__', 'x', 'mx', 'later'])
-later dict_keys(['__name__', '__doc__', '__package__', '__loader__', '__spec__', '__path__', '__file__', '__cached__', '__builtins__', 'x', 'mx', 'later'])
+no mx
+inside dict_keys(['__name__', '__doc__', '__package__', '__loader__', '__spec__', '__path__', '__file__', '__cached__', '__builtins__', 'x'])
+outside dict_keys(['__name__', '__doc__', '__package__', '__loader__', '__spec__', '__path__', '__file__', '__cached__', '__builtins__', 'x', 'later'])
+later dict_keys(['__name__', '__doc__', '__package__', '__loader__', '__spec__', '__path__', '__file__', '__cached__', '__builtins__', 'x', 'later'])
 """
         ),
         transformed_stderr=snapshot("<equal to normal>"),
@@ -349,6 +364,167 @@ later dict_keys(['__name__', '__doc__', '__package__', '__loader__', '__spec__',
     )
 
 
+def test_mutable_globals():
+    check_script(
+        {
+            "test_pck/__init__.py": """\
+from .mx import x
+from .my import y
+import sys
+
+g = globals()
+g["z"] = 1
+print(z, g is globals())
+del g["z"]
+print("z" in globals())
+
+def f():
+    globals()["w"] = x
+    print(globals()["w"], "test_pck.my" in sys.modules)
+    globals()["v"] = 2
+""",
+            "test_pck/mx.py": """\
+x=5
+""",
+            "test_pck/my.py": """\
+y=5
+""",
+        },
+        """\
+import test_pck
+
+test_pck.f()
+print(test_pck.w, test_pck.v)
+""",
+        transformed_stdout=snapshot(
+            """\
+1 True
+False
+5 False
+5 2
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+1 True
+False
+5 True
+5 2
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_globals_dict():
+    check_script(
+        {
+            "test_pck/__init__.py": """\
+import types
+import typing
+from .mx import X
+
+def f(a: "X") -> "X":
+    return a
+
+print(typing.get_type_hints(f, globals()))
+
+g = types.FunctionType((lambda: X).__code__, globals())
+print(g(), isinstance(globals(), dict))
+""",
+            "test_pck/mx.py": """\
+class X:
+    pass
+""",
+        },
+        """\
+import test_pck
+""",
+        transformed_stdout=snapshot("<equal to normal>"),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+{'a': <class 'test_pck.mx.X'>, 'return': <class 'test_pck.mx.X'>}
+<class 'test_pck.mx.X'> True
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_globals_resolves_keys():
+    check_script(
+        {
+            "test_pck/__init__.py": """\
+from .mx import x
+from .my import y
+import sys
+
+for name in ["a", "b"]:
+    globals()[name] = x
+print(a, b, "test_pck.my" in sys.modules)
+print(globals()["y"], "test_pck.my" in sys.modules)
+
+def f():
+    return globals().get("y"), len(globals()) == len(vars(sys.modules[__name__]))
+""",
+            "test_pck/mx.py": """\
+x=5
+""",
+            "test_pck/my.py": """\
+y=6
+""",
+        },
+        """\
+import test_pck
+
+print(test_pck.f())
+""",
+        transformed_stdout=snapshot(
+            """\
+5 5 False
+6 True
+(6, True)
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+5 5 True
+6 True
+(6, True)
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_redefined_globals():
+    check_script(
+        {
+            "test_pck/__init__.py": """\
+from .mx import x
+
+globals = {"site": x}
+
+def f():
+    return globals["site"]
+
+print(f(), globals)
+""",
+            "test_pck/mx.py": "x = 5",
+        },
+        """\
+import test_pck
+""",
+        transformed_stdout=snapshot("<equal to normal>"),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot("5 {'site': 5}\n"),
+        normal_stderr=snapshot(""),
+    )
+
+
 def test_import_module_with_error():
     check_script(
         {
@@ -456,167 +632,1272 @@ print(mb.a)
     )
 
 
-def test_lazy_module_setattr():
+def test_import_from_siblings():
     check_script(
         {
             "test_pck/__init__.py": """\
-from .ma import b
-
-def foo():
-    print(b())
-
+from . import ma
+from .mb import x
+from .mb import y
+from .mb import z
 """,
             "test_pck/ma.py": """\
-def b():
-    return 5
+a = 5
+""",
+            "test_pck/mb.py": """\
+x = 1
+y = 2
+from .ma import a as z
 """,
         },
         """\
-from test_pck import foo
 import test_pck
 
-foo()
-test_pck.b=lambda:6
-foo()
-
+print(test_pck.ma.a)
+print(test_pck.x)
+print({key: type(value).__name__ for key, value in vars(test_pck).items() if key in "xyz"})
 """,
-        transformed_stdout=snapshot("<equal to normal>"),
+        transformed_stdout=snapshot(
+            """\
+5
+1
+{'x': 'int', 'y': 'int', 'z': 'ImportFrom'}
+"""
+        ),
         transformed_stderr=snapshot("<equal to normal>"),
         normal_stdout=snapshot(
             """\
 5
-6
+1
+{'x': 'int', 'y': 'int', 'z': 'int'}
 """
         ),
         normal_stderr=snapshot(""),
     )
 
 
-def test_loader_is_used():
+def test_import_from_siblings_circular():
     check_script(
         {
-            "test_pck/__init__.py": """\
+            "test_pck/__init__.py": "",
+            "test_pck/ma.py": """\
+x = 1
+y = "partial"
+from .mb import use
+print(use())
+y = "final"
+""",
+            "test_pck/mb.py": """\
+from .ma import x
+from .ma import y
 
-def foo():
-    print("foo")
+def use():
+    return x
 
+def later():
+    return y
 """,
         },
         """\
-import test_pck
-
-print(type(test_pck.__spec__.loader))
+import test_pck.ma
+from test_pck.mb import later
 
+print(later())
 """,
         transformed_stdout=snapshot(
             """\
-<class 'lazy_imports_lite._loader.LazyLoader'>
+1
+final
 """
         ),
         transformed_stderr=snapshot("<equal to normal>"),
         normal_stdout=snapshot(
             """\
-<class '_frozen_importlib_external.SourceFileLoader'>
+1
+partial
 """
         ),
         normal_stderr=snapshot(""),
     )
 
 
-def test_different_package_and_project_name():
+def test_import_submodules():
     check_script(
-        package(
-            "py-test-pck",
-            {
-                "source/test_pck/__init__.py": """\
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/user.py": """\
+import test_pck.sub.a
+import test_pck.sub.b
+import test_pck.other
 
-def foo():
-    print("foo")
+def use_a():
+    return test_pck.sub.a.x
 
+def use_all():
+    return test_pck.sub.b.x + test_pck.other.x
 """,
-            },
-            extra_config="""
-[tool.hatch.build.targets.wheel]
-packages = ["source/test_pck"]
-""",
-        ),
+            "test_pck/sub/__init__.py": "",
+            "test_pck/sub/a.py": "x = 1",
+            "test_pck/sub/b.py": "x = 2",
+            "test_pck/other.py": "x = 3",
+        },
         """\
-import test_pck
+import sys
+from test_pck import user
 
-print(type(test_pck.__spec__.loader))
+def loaded():
+    return sorted(m for m in sys.modules if m.startswith("test_pck."))
 
+print(loaded())
+print(user.use_a())
+print(loaded())
+print(user.use_all())
+print(loaded())
+print(user.test_pck is sys.modules["test_pck"])
 """,
         transformed_stdout=snapshot(
             """\
-<class 'lazy_imports_lite._loader.LazyLoader'>
+['test_pck.user']
+1
+['test_pck.sub', 'test_pck.sub.a', 'test_pck.user']
+5
+['test_pck.other', 'test_pck.sub', 'test_pck.sub.a', 'test_pck.sub.b', 'test_pck.user']
+True
 """
         ),
         transformed_stderr=snapshot("<equal to normal>"),
         normal_stdout=snapshot(
             """\
-<class '_frozen_importlib_external.SourceFileLoader'>
+['test_pck.other', 'test_pck.sub', 'test_pck.sub.a', 'test_pck.sub.b', 'test_pck.user']
+1
+['test_pck.other', 'test_pck.sub', 'test_pck.sub.a', 'test_pck.sub.b', 'test_pck.user']
+5
+['test_pck.other', 'test_pck.sub', 'test_pck.sub.a', 'test_pck.sub.b', 'test_pck.user']
+True
 """
         ),
         normal_stderr=snapshot(""),
     )
 
 
-def test_namespace_package():
+def test_import_submodules_per_binding():
     check_script(
-        [
-            package(
-                "test-pck-a",
-                {
-                    "source/test_pck/a/__init__.py": """\
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/other.py": """\
+import test_pck.sub.unused
+""",
+            "test_pck/user.py": """\
+import types
+import test_pck.sub.a
 
-def foo():
-    print("foo")
+def is_module():
+    return isinstance(test_pck, types.ModuleType)
 
+def use_a():
+    return test_pck.sub.a.x
 """,
-                },
-                extra_config="""
-[tool.hatch.build.targets.wheel]
-packages = ["source/test_pck"]
+            "test_pck/sub/__init__.py": "",
+            "test_pck/sub/a.py": "x = 1",
+            "test_pck/sub/unused.py": "",
+        },
+        """\
+import sys
+import test_pck.other
+from test_pck import user
+
+print(user.is_module())
+print(user.use_a(), "test_pck.sub.unused" in sys.modules)
+print(vars(user)["test_pck"] is sys.modules["test_pck"])
 """,
-            ),
-            package(
-                "test-pck-b",
-                {
-                    "source/test_pck/b/__init__.py": """\
+        transformed_stdout=snapshot(
+            """\
+True
+1 False
+True
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+True
+1 True
+True
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
 
-def foo():
-    print("foo")
 
+def test_hoist_function_imports():
+    check_script(
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/user.py": """\
+def use_json():
+    import json
+    return json.dumps(1)
+
+def use_missing():
+    try:
+        from test_pck import missing
+    except ImportError:
+        return "ImportError"
 """,
-                },
-                extra_config="""
-[tool.hatch.build.targets.wheel]
-packages = ["source/test_pck"]
-""",
-                lazy_imports_enabled=False,
-            ),
-        ],
+        },
         """\
-import test_pck
-import test_pck.a
-import test_pck.b
+import os
+import sys
+os.environ["LAZY_IMPORTS_LITE_HOIST_FUNCTION_IMPORTS"] = "1"
+sys.modules.pop("json", None)
 
-for pck in (test_pck,test_pck.a,test_pck.b):
-    print(pck.__name__, str(type(pck.__spec__.loader)).replace("_",""))
+from test_pck import user
+
+print("json" in sys.modules)
+code = user.use_json.__code__
+print(user.use_json(), "json" in sys.modules)
+print(user.use_json.__code__ is code)
+print(user.use_missing())
+print(user.use_missing())
 """,
         transformed_stdout=snapshot(
             """\
-test_pck <class 'frozenimportlibexternal.NamespaceLoader'>
-test_pck.a <class 'lazyimportslite.loader.LazyLoader'>
-test_pck.b <class 'frozenimportlibexternal.SourceFileLoader'>
+False
+1 True
+False
+ImportError
+ImportError
 """
         ),
         transformed_stderr=snapshot("<equal to normal>"),
         normal_stdout=snapshot(
             """\
-test_pck <class 'frozenimportlibexternal.NamespaceLoader'>
-test_pck.a <class 'frozenimportlibexternal.SourceFileLoader'>
-test_pck.b <class 'frozenimportlibexternal.SourceFileLoader'>
+False
+1 True
+True
+ImportError
+ImportError
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_hoist_function_imports_missing_submodule():
+    check_script(
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/user.py": """\
+def use_missing():
+    try:
+        import test_pck.missing
+    except ImportError:
+        return "fallback"
+    return test_pck.missing
+""",
+        },
+        """\
+import os
+os.environ["LAZY_IMPORTS_LITE_HOIST_FUNCTION_IMPORTS"] = "1"
+
+from test_pck import user
+
+print(user.use_missing())
+print(user.use_missing())
+""",
+        transformed_stdout=snapshot("<equal to normal>"),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+fallback
+fallback
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_conditional_and_class_imports():
+    check_script(
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/user.py": """\
+import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from test_pck import missing
+
+if sys.platform:
+    from test_pck.a import x
+else:
+    x = None
+
+class C:
+    from test_pck.b import x
+""",
+            "test_pck/a.py": "x = 1",
+            "test_pck/b.py": "x = 2",
+        },
+        """\
+import sys
+from test_pck import user
+
+def loaded():
+    return sorted(m for m in sys.modules if m.startswith("test_pck."))
+
+print(loaded())
+print(user.x, loaded())
+print(user.C.x, loaded())
+print(hasattr(user, "missing"))
+""",
+        transformed_stdout=snapshot(
+            """\
+['test_pck.user']
+1 ['test_pck.a', 'test_pck.user']
+2 ['test_pck.a', 'test_pck.b', 'test_pck.user']
+False
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+['test_pck.a', 'test_pck.b', 'test_pck.user']
+1 ['test_pck.a', 'test_pck.b', 'test_pck.user']
+2 ['test_pck.a', 'test_pck.b', 'test_pck.user']
+False
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_probe_imports():
+    check_script(
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/user.py": """\
+try:
+    from test_pck._speedups import impl
+except ImportError:
+    from test_pck._python import impl
+
+try:
+    from test_pck import _missing
+except ImportError:
+    _missing = None
+
+try:
+    import test_pck.backend as backend
+except ImportError:
+    backend = None
+""",
+            "test_pck/_python.py": "impl = 'python'",
+            "test_pck/backend.py": "name = 'backend'",
+        },
+        """\
+import os
+import sys
+os.environ["LAZY_IMPORTS_LITE_PROBE_IMPORTS"] = "1"
+
+from test_pck import user
+
+def loaded():
+    return sorted(m for m in sys.modules if m.startswith("test_pck."))
+
+print(loaded())
+print(user.impl, user._missing, loaded())
+print(user.backend.name, loaded())
+""",
+        transformed_stdout=snapshot(
+            """\
+['test_pck.user']
+python None ['test_pck._python', 'test_pck.user']
+backend ['test_pck._python', 'test_pck.backend', 'test_pck.user']
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+['test_pck._python', 'test_pck.backend', 'test_pck.user']
+python None ['test_pck._python', 'test_pck.backend', 'test_pck.user']
+backend ['test_pck._python', 'test_pck.backend', 'test_pck.user']
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_eager_imports():
+    check_script(
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/user.py": """\
+from lazy_imports_lite import eager_imports
+from lazy_imports_lite import lazy_imports
+
+with eager_imports():
+    import test_pck.registered
+
+import test_pck.a
+from test_pck.b import b
+
+with lazy_imports():
+    import test_pck.c
+
+def use_d():
+    import test_pck.d
+""",
+            "test_pck/registered.py": "print('registered')",
+            "test_pck/a.py": "import test_pck.sub.e",
+            "test_pck/b.py": "b = 'b'",
+            "test_pck/c.py": "",
+            "test_pck/d.py": "",
+            "test_pck/sub/__init__.py": "",
+            "test_pck/sub/e.py": "",
+        },
+        """\
+import sys
+from lazy_imports_lite import eager_imports
+
+def loaded():
+    return sorted(m for m in sys.modules if m.startswith("test_pck."))
+
+with eager_imports():
+    from test_pck import user
+    print(loaded())
+print(loaded())
+""",
+        transformed_stdout=snapshot(
+            """\
+registered
+['test_pck.registered', 'test_pck.user']
+['test_pck.a', 'test_pck.b', 'test_pck.registered', 'test_pck.sub', 'test_pck.sub.e', 'test_pck.user']
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+registered
+['test_pck.a', 'test_pck.b', 'test_pck.c', 'test_pck.registered', 'test_pck.sub', 'test_pck.sub.e', 'test_pck.user']
+['test_pck.a', 'test_pck.b', 'test_pck.c', 'test_pck.registered', 'test_pck.sub', 'test_pck.sub.e', 'test_pck.user']
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_configuration():
+    check_script(
+        package(
+            "test_pck",
+            {
+                "test_pck/__init__.py": "",
+                "test_pck/user.py": """\
+import test_pck.a
+import test_pck.b  # lazy-imports-lite: eager
+from . import c
+from test_pck import d
+""",
+                "test_pck/legacy.py": "import test_pck.e",
+                "test_pck/a.py": "",
+                "test_pck/b.py": "",
+                "test_pck/c.py": "",
+                "test_pck/d.py": "",
+                "test_pck/e.py": "",
+            },
+            extra_config="""
+[tool.lazy-imports-lite]
+exclude = ["test_pck.legacy"]
+eager = ["test_pck.c"]
+""",
+        ),
+        """\
+import sys
+
+def loaded():
+    return sorted(m for m in sys.modules if m.startswith("test_pck."))
+
+import test_pck.user
+print(loaded())
+import test_pck.legacy
+print(loaded())
+print(type(test_pck.legacy.__spec__.loader).__name__)
+""",
+        transformed_stdout=snapshot(
+            """\
+['test_pck.b', 'test_pck.c', 'test_pck.user']
+['test_pck.b', 'test_pck.c', 'test_pck.e', 'test_pck.legacy', 'test_pck.user']
+SourceFileLoader
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+['test_pck.a', 'test_pck.b', 'test_pck.c', 'test_pck.d', 'test_pck.user']
+['test_pck.a', 'test_pck.b', 'test_pck.c', 'test_pck.d', 'test_pck.e', 'test_pck.legacy', 'test_pck.user']
+SourceFileLoader
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_configuration_keywords():
+    check_script(
+        package(
+            "test_pck",
+            {
+                "test_pck/__init__.py": "",
+                "test_pck/user.py": """\
+import test_pck.a
+from . import c
+""",
+                "test_pck/legacy.py": "import test_pck.e",
+                "test_pck/a.py": "",
+                "test_pck/c.py": "",
+                "test_pck/e.py": "",
+            },
+            keywords=["lazy-imports-lite-exclude=test_pck.legacy"]
+            + ["lazy-imports-lite-eager=test_pck.c"],
+            wheel=True,
+        ),
+        """\
+import sys
+
+def loaded():
+    return sorted(m for m in sys.modules if m.startswith("test_pck."))
+
+import test_pck.user
+print(loaded())
+import test_pck.legacy
+print(loaded())
+print(type(test_pck.legacy.__spec__.loader).__name__)
+""",
+        transformed_stdout=snapshot(
+            """\
+['test_pck.c', 'test_pck.user']
+['test_pck.c', 'test_pck.e', 'test_pck.legacy', 'test_pck.user']
+SourceFileLoader
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+['test_pck.a', 'test_pck.c', 'test_pck.user']
+['test_pck.a', 'test_pck.c', 'test_pck.e', 'test_pck.legacy', 'test_pck.user']
+SourceFileLoader
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_profile():
+    check_script(
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/user.py": """\
+from test_pck.a import a
+import test_pck.b
+
+def use():
+    return a, test_pck.b.b
+""",
+            "test_pck/a.py": "a = 1",
+            "test_pck/b.py": "b = 2",
+            "test_pck/c.py": "",
+            "test_pck/d/__init__.py": "",
+            "test_pck/d/e.py": "",
+        },
+        """\
+import sys
+from lazy_imports_lite import warm_up
+from lazy_imports_lite._profile import recorded
+from lazy_imports_lite._profile import start_recording
+
+def loaded():
+    return sorted(m for m in sys.modules if m.startswith("test_pck."))
+
+start_recording("profile.txt")
+from test_pck import user
+print(user.use())
+print([(module, name) for module, name, _ in recorded()])
+
+with open("warm_up.txt", "w") as f:
+    f.write('''\
+# lazy-imports-lite profile
+1.0\ttest_pck.c\t
+1.0\ttest_pck.d\te
+1.0\ttest_pck.missing\t
+''')
+
+print(loaded())
+warm_up("warm_up.txt").join()
+print(loaded())
+""",
+        transformed_stdout=snapshot(
+            """\
+(1, 2)
+[('test_pck.a', 'a'), ('test_pck', None), ('test_pck.b', None)]
+['test_pck.a', 'test_pck.b', 'test_pck.user']
+['test_pck.a', 'test_pck.b', 'test_pck.c', 'test_pck.d', 'test_pck.d.e', 'test_pck.user']
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+(1, 2)
+[]
+['test_pck.a', 'test_pck.b', 'test_pck.user']
+['test_pck.a', 'test_pck.b', 'test_pck.c', 'test_pck.d', 'test_pck.d.e', 'test_pck.user']
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_asyncio():
+    check_script(
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/user.py": """\
+from lazy_imports_lite import resolve_async
+from test_pck.a import thread_name
+import test_pck.b.c
+
+async def use():
+    await resolve_async("thread_name")
+    return thread_name
+
+async def undefined():
+    await resolve_async("missing")
+""",
+            "test_pck/a.py": """\
+import threading
+thread_name = threading.current_thread().name
+""",
+            "test_pck/b/__init__.py": "",
+            "test_pck/b/c.py": "",
+        },
+        """\
+import asyncio
+import sys
+from lazy_imports_lite import warm_up_when_idle
+
+def loaded():
+    return sorted(m for m in sys.modules if m.startswith("test_pck."))
+
+from test_pck import user
+
+async def main():
+    print(await user.use() == "MainThread")
+    try:
+        await user.undefined()
+    except NameError as e:
+        print(e)
+
+    print(loaded())
+    await warm_up_when_idle(interval=0.01, max_lag=1)
+    print(loaded())
+
+asyncio.run(main())
+""",
+        transformed_stdout=snapshot(
+            """\
+False
+name 'missing' is not defined
+['test_pck.a', 'test_pck.user']
+['test_pck.a', 'test_pck.b', 'test_pck.b.c', 'test_pck.user']
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+True
+name 'missing' is not defined
+['test_pck.a', 'test_pck.b', 'test_pck.b.c', 'test_pck.user']
+['test_pck.a', 'test_pck.b', 'test_pck.b.c', 'test_pck.user']
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_prefetch():
+    check_script(
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/user.py": "from test_pck.a import a",
+            "test_pck/a.py": "a = 1",
+            "test_pck/b/__init__.py": "import test_pck.b.c",
+            "test_pck/b/c.py": "",
+            "test_pck/slow.py": "import time; time.sleep(0.5)",
+        },
+        """\
+import sys
+from lazy_imports_lite import prefetch
+
+def loaded():
+    return sorted(m for m in sys.modules if m.startswith("test_pck."))
+
+from test_pck import user
+print(loaded())
+print(prefetch(["test_pck.b.c", "test_pck.b", "test_pck.missing", user.__dict__["a"]], workers=2))
+print(loaded())
+print(prefetch(["test_pck.slow"], timeout=0.1))
+""",
+        transformed_stdout=snapshot(
+            """\
+['test_pck.user']
+True
+['test_pck.a', 'test_pck.b', 'test_pck.b.c', 'test_pck.user']
+False
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+['test_pck.a', 'test_pck.user']
+True
+['test_pck.a', 'test_pck.b', 'test_pck.b.c', 'test_pck.user']
+False
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_resolve_all():
+    check_script(
+        [
+            {
+                "test_pck/__init__.py": "",
+                "test_pck/user.py": """\
+import test_pck.a
+from test_pck.b import b
+""",
+                "test_pck/a.py": "import test_pck.c",
+                "test_pck/b.py": "b = 1",
+                "test_pck/c.py": "import json",
+            },
+            package(
+                "other_pck",
+                {
+                    "other_pck/__init__.py": "",
+                    "other_pck/user.py": "import other_pck.a",
+                    "other_pck/a.py": "",
+                },
+            ),
+        ],
+        """\
+import sys
+from lazy_imports_lite import resolve_all
+
+def loaded():
+    return sorted(m for m in sys.modules if m.startswith(("test_pck.", "other_pck.")))
+
+from test_pck import user
+from other_pck import user
+
+with open("profile.txt", "w") as f:
+    f.write("1.0\\ttest_pck.b\\tb\\n1.0\\tother_pck.a\\t\\n")
+
+print(resolve_all("test_pck", profile="profile.txt")[0])
+print(loaded())
+
+modules, rss = resolve_all(["test_pck"], freeze=True)
+print(modules, rss is not None)
+print(loaded())
+
+print(resolve_all()[0])
+print(loaded())
+""",
+        transformed_stdout=snapshot(
+            """\
+1
+['other_pck.user', 'test_pck.b', 'test_pck.user']
+2 True
+['other_pck.user', 'test_pck.a', 'test_pck.b', 'test_pck.c', 'test_pck.user']
+1
+['other_pck.a', 'other_pck.user', 'test_pck.a', 'test_pck.b', 'test_pck.c', 'test_pck.user']
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+0
+['other_pck.a', 'other_pck.user', 'test_pck.a', 'test_pck.b', 'test_pck.c', 'test_pck.user']
+0 True
+['other_pck.a', 'other_pck.user', 'test_pck.a', 'test_pck.b', 'test_pck.c', 'test_pck.user']
+0
+['other_pck.a', 'other_pck.user', 'test_pck.a', 'test_pck.b', 'test_pck.c', 'test_pck.user']
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_stats():
+    check_script(
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/user.py": """\
+from test_pck.a import a
+import test_pck.b
+from test_pck.c import c
+
+def use():
+    return a, test_pck.b.b
+""",
+            "test_pck/a.py": """\
+from test_pck.c import c
+a = c
+""",
+            "test_pck/b.py": "b = 2",
+            "test_pck/c.py": "c = 1",
+        },
+        """\
+import io
+import os
+import re
+import threading
+from lazy_imports_lite import stats
+from lazy_imports_lite._stats import enable_stats
+from lazy_imports_lite._stats import print_import_times
+
+enable_stats()
+from test_pck import user
+thread = threading.Thread(target=user.use, name="worker")
+thread.start()
+thread.join()
+
+for stat in stats():
+    location = stat.location and (os.path.basename(stat.location[0]), stat.location[1])
+    print(stat.module, stat.name, stat.imported, stat.resolved, stat.thread, location)
+
+out = io.StringIO()
+print_import_times(out)
+print(re.sub(r" +[0-9]+ \\|", " <t> |", out.getvalue().replace(os.path.dirname(user.__file__), "")))
+""",
+        transformed_stdout=snapshot(
+            """\
+test_pck.a c ('test_pck.c', 'c') True worker ('a.py', 2)
+test_pck.user a ('test_pck.a', 'a') True worker ('user.py', 6)
+test_pck.user test_pck ('test_pck', None) True worker ('user.py', 6)
+import time: self [us] | cumulative | imported package
+import time: <t> | <t> |   test_pck.c:c (/a.py:2)
+import time: <t> | <t> | test_pck.a:a (/user.py:6)
+import time: <t> | <t> | test_pck (/user.py:6)
+import time: <t> | <t> | test_pck.b (/user.py:6)
+
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+import time: self [us] | cumulative | imported package
+
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_lazy_module_setattr():
+    check_script(
+        {
+            "test_pck/__init__.py": """\
+from .ma import b
+
+def foo():
+    print(b())
+
+""",
+            "test_pck/ma.py": """\
+def b():
+    return 5
+""",
+        },
+        """\
+from test_pck import foo
+import test_pck
+
+foo()
+test_pck.b=lambda:6
+foo()
+
+""",
+        transformed_stdout=snapshot("<equal to normal>"),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+5
+6
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_resolved_globals():
+    check_script(
+        {
+            "test_pck/__init__.py": """\
+from .ma import b
+from .ma import c
+
+counter = 0
+
+def foo():
+    return b()
+
+def bar():
+    return b() + c()
+
+def inc():
+    global counter
+    counter += b()
+""",
+            "test_pck/ma.py": """\
+def b():
+    return 5
+
+def c():
+    return 1
+""",
+        },
+        """\
+import test_pck
+
+print(test_pck.foo(), "lazy_value" in test_pck.foo.__code__.co_names)
+print(test_pck.bar(), "lazy_value" in test_pck.bar.__code__.co_names)
+test_pck.inc()
+test_pck.inc()
+print(test_pck.counter)
+print(type(vars(test_pck)["b"]).__name__)
+""",
+        transformed_stdout=snapshot("<equal to normal>"),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+5 False
+6 False
+10
+function
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_lazy_module_attributes():
+    check_script(
+        {
+            "test_pck/__init__.py": """\
+from .ma import b
+from .ma import c
+from .ma import d
+from .mb import e
+
+def __getattr__(name):
+    return "getattr " + name
+""",
+            "test_pck/ma.py": """\
+b = 1
+c = 2
+d = 3
+""",
+            "test_pck/mb.py": """\
+from test_pck import b
+print("mb", b)
+e = 5
+""",
+        },
+        """\
+import test_pck
+
+print(test_pck.c)
+print(test_pck.e)
+test_pck.d = 4
+print(test_pck.d)
+del test_pck.d
+print(test_pck.d)
+print([name for name in vars(type(test_pck)) if not name.startswith("__")])
+""",
+        transformed_stdout=snapshot(
+            """\
+2
+mb 1
+5
+4
+getattr d
+[]
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+mb 1
+2
+5
+4
+getattr d
+[]
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_threads():
+    check_script(
+        {
+            "test_pck/__init__.py": """\
+from .slow import value
+import test_pck.sub
+import test_pck.sub.mod
+
+def get_value():
+    return value
+
+def get_mod():
+    return test_pck.sub.mod.x
+""",
+            "test_pck/slow.py": """\
+import time
+time.sleep(0.1)
+value = object()
+""",
+            "test_pck/sub/__init__.py": "",
+            "test_pck/sub/mod.py": """\
+import time
+time.sleep(0.1)
+x = 5
+""",
+        },
+        """\
+import threading
+import test_pck
+
+barrier = threading.Barrier(16)
+results = []
+errors = []
+
+def worker():
+    try:
+        barrier.wait()
+        results.append((test_pck.get_value(), test_pck.value, test_pck.get_mod()))
+    except BaseException as e:
+        errors.append(e)
+
+threads = [threading.Thread(target=worker) for _ in range(16)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+
+print(errors)
+print(len(results), len({id(v) for r in results for v in r[:2]}), {r[2] for r in results})
+print(test_pck.value is test_pck.get_value())
+""",
+        transformed_stdout=snapshot("<equal to normal>"),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+[]
+16 1 {5}
+True
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_loader_is_used():
+    check_script(
+        {
+            "test_pck/__init__.py": """\
+
+def foo():
+    print("foo")
+
+""",
+        },
+        """\
+import test_pck
+
+print(type(test_pck.__spec__.loader))
+
+""",
+        transformed_stdout=snapshot(
+            """\
+<class 'lazy_imports_lite._loader.LazyLoader'>
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+<class '_frozen_importlib_external.SourceFileLoader'>
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_different_package_and_project_name():
+    check_script(
+        package(
+            "py-test-pck",
+            {
+                "source/test_pck/__init__.py": """\
+
+def foo():
+    print("foo")
+
+""",
+            },
+            extra_config="""
+[tool.hatch.build.targets.wheel]
+packages = ["source/test_pck"]
+""",
+        ),
+        """\
+import test_pck
+
+print(type(test_pck.__spec__.loader))
+
+""",
+        transformed_stdout=snapshot(
+            """\
+<class 'lazy_imports_lite._loader.LazyLoader'>
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+<class '_frozen_importlib_external.SourceFileLoader'>
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_namespace_package():
+    check_script(
+        [
+            package(
+                "test-pck-a",
+                {
+                    "source/test_pck/a/__init__.py": """\
+
+def foo():
+    print("foo")
+
+""",
+                },
+                extra_config="""
+[tool.hatch.build.targets.wheel]
+packages = ["source/test_pck"]
+""",
+            ),
+            package(
+                "test-pck-b",
+                {
+                    "source/test_pck/b/__init__.py": """\
+
+def foo():
+    print("foo")
+
+""",
+                },
+                extra_config="""
+[tool.hatch.build.targets.wheel]
+packages = ["source/test_pck"]
+""",
+                lazy_imports_enabled=False,
+            ),
+        ],
+        """\
+import test_pck
+import test_pck.a
+import test_pck.b
+
+for pck in (test_pck,test_pck.a,test_pck.b):
+    print(pck.__name__, str(type(pck.__spec__.loader)).replace("_",""))
+""",
+        transformed_stdout=snapshot(
+            """\
+test_pck <class 'frozenimportlibexternal.NamespaceLoader'>
+test_pck.a <class 'lazyimportslite.loader.LazyLoader'>
+test_pck.b <class 'frozenimportlibexternal.SourceFileLoader'>
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+test_pck <class 'frozenimportlibexternal.NamespaceLoader'>
+test_pck.a <class 'frozenimportlibexternal.SourceFileLoader'>
+test_pck.b <class 'frozenimportlibexternal.SourceFileLoader'>
+"""
+        ),
+        normal_stderr=snapshot(""),
+    )
+
+
+def test_count_lazy_loads():
+    check_script(
+        {
+            "test_pck/__init__.py": "",
+            "test_pck/user.py": """\
+from test_pck.a import a
+import test_pck.b
+
+class C:
+    def hot(self):
+        return sum(a for _ in range(5))
+
+def cold():
+    return test_pck.b.b
+""",
+            "test_pck/other.py": """\
+from test_pck.a import a
+
+def hot():
+    return a
+""",
+            "test_pck/a.py": "a = 1",
+            "test_pck/b.py": "b = 2",
+        },
+        """\
+import sys
+from lazy_imports_lite import _loader
+from lazy_imports_lite._stats import print_lazy_value_counts
+
+_loader.instrumented_modules = ("test_pck.user",)
+from test_pck import user, other
+user.C().hot()
+user.C().hot()
+user.cold()
+other.hot()
+
+print_lazy_value_counts(sys.stdout)
+""",
+        transformed_stdout=snapshot(
+            """\
+lazy-imports-lite: executed lazy references per function
+         5  test_pck.user:C.hot
+         1  test_pck.user:cold
+lazy-imports-lite: executed lazy references per name
+         5  test_pck.user:C.hot  a
+         1  test_pck.user:cold  test_pck
+"""
+        ),
+        transformed_stderr=snapshot("<equal to normal>"),
+        normal_stdout=snapshot(
+            """\
+lazy-imports-lite: executed lazy references per function
+lazy-imports-lite: executed lazy references per name
 """
         ),
         normal_stderr=snapshot(""),
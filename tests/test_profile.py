@@ -0,0 +1,46 @@
+import os
+import subprocess as sp
+
+from inline_snapshot import snapshot
+from lazy_imports_lite._profile import read_profile
+from lazy_imports_lite._profile import write_profile
+
+
+def test_profile_file(tmp_path):
+    path = tmp_path / "profile.txt"
+    write_profile(
+        str(path),
+        [
+            ("a", None, 0.002),
+            ("a.b", "c", 0.001),
+            ("a", None, 0.0),
+        ],
+    )
+    assert path.read_text().splitlines() == snapshot(
+        ["# lazy-imports-lite profile", "2.000\ta\t", "1.000\ta.b\tc"]
+    )
+    assert read_profile(str(path)) == snapshot(
+        [("a", None, 0.002), ("a.b", "c", 0.001)]
+    )
+
+
+def test_record_profile(tmp_path):
+    (tmp_path / "script.py").write_text(
+        """\
+from json import dumps
+import xml.dom
+import missing
+
+print(dumps(1), xml.dom.__name__)
+"""
+    )
+    result = sp.run(
+        ["lazy-imports-lite", "run", "script.py"],
+        cwd=str(tmp_path),
+        env={**os.environ, "LAZY_IMPORTS_LITE_PROFILE": "profile.txt"},
+        capture_output=True,
+    )
+    assert result.returncode == 0
+    assert [
+        (module, name) for module, name, _ in read_profile(tmp_path / "profile.txt")
+    ] == snapshot([("json", "dumps"), ("xml", None), ("xml.dom", None)])
@@ -0,0 +1,111 @@
+import os
+import subprocess as sp
+import sys
+
+import pytest
+from inline_snapshot import snapshot
+from lazy_imports_lite import _loader
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    monkeypatch.setattr(sys, "path", [str(tmp_path / "site-packages")])
+    monkeypatch.setattr(_loader, "enabled_packages", set())
+    monkeypatch.setattr(_loader, "package_configs", {})
+    monkeypatch.setattr(_loader, "registry_path", lambda: str(tmp_path / "registry"))
+    monkeypatch.setattr(
+        sys,
+        "meta_path",
+        [m for m in sys.meta_path if not isinstance(m, _loader.LazyLoader)],
+    )
+    monkeypatch.delenv("LAZY_IMPORTS_LITE_DISABLE", raising=False)
+
+    (tmp_path / "site-packages").mkdir()
+
+    scans = []
+
+    def scan_distributions():
+        scans.append(1)
+        return {"some_package"}, {}, []
+
+    monkeypatch.setattr(_loader, "scan_distributions", scan_distributions)
+
+    return scans
+
+
+def test_registry(registry, tmp_path, monkeypatch):
+    _loader.load_enabled_packages()
+    assert registry == [1]
+    assert _loader.enabled_packages == {"some_package"}
+
+    monkeypatch.setattr(_loader, "enabled_packages", set())
+    _loader.load_enabled_packages()
+    assert registry == [1]
+    assert _loader.enabled_packages == {"some_package"}
+
+    # installing something changes the mtime of the directory
+    (tmp_path / "site-packages" / "new_package").mkdir()
+    _loader.load_enabled_packages()
+    assert registry == [1, 1]
+
+
+def test_registry_without_bytecode(registry, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+
+    _loader.load_enabled_packages()
+    _loader.load_enabled_packages()
+    assert registry == [1]
+
+
+def test_setup(registry):
+    _loader.setup()
+    assert registry == [1]
+    assert isinstance(sys.meta_path[0], _loader.LazyLoader)
+
+
+def test_setup_disabled(registry, monkeypatch):
+    monkeypatch.setenv("LAZY_IMPORTS_LITE_DISABLE", "1")
+    meta_path = list(sys.meta_path)
+
+    _loader.setup()
+    assert registry == []
+    assert sys.meta_path == meta_path
+
+
+def test_enabled_package(monkeypatch):
+    monkeypatch.setattr(_loader, "enabled_packages", {"pck", "ns.pck"})
+
+    assert _loader.enabled_package("pck") == "pck"
+    assert _loader.enabled_package("pck.sub.module") == "pck"
+    assert _loader.enabled_package("ns.pck") == "ns.pck"
+    assert _loader.enabled_package("ns.pck.sub") == "ns.pck"
+    assert _loader.enabled_package("ns") is None
+    assert _loader.enabled_package("ns.other") is None
+    assert _loader.enabled_package("pck2") is None
+    assert _loader.enabled_package("os.path") is None
+
+    assert _loader.LazyLoader().find_spec("os") is None
+
+
+def test_startup_imports():
+    script = """\
+import sys
+import lazy_imports_lite
+
+def loaded():
+    return sorted(m for m in sys.modules if m.startswith("lazy_imports_lite."))
+
+print(loaded())
+print(lazy_imports_lite.stats.__module__)
+print(loaded())
+"""
+    env = {k: v for k, v in os.environ.items() if k != "LAZY_IMPORTS_LITE_DISABLE"}
+    result = sp.run([sys.executable, "-c", script], capture_output=True, env=env)
+    assert result.stdout.decode().replace("\r\n", "\n") == snapshot(
+        """\
+['lazy_imports_lite._archive', 'lazy_imports_lite._cache', 'lazy_imports_lite._config', 'lazy_imports_lite._hooks', 'lazy_imports_lite._loader', 'lazy_imports_lite._transformer']
+lazy_imports_lite._stats
+['lazy_imports_lite._archive', 'lazy_imports_lite._cache', 'lazy_imports_lite._config', 'lazy_imports_lite._hooks', 'lazy_imports_lite._loader', 'lazy_imports_lite._stats', 'lazy_imports_lite._transformer']
+"""
+    )
@@ -6,11 +6,12 @@ from pathlib import Path
 from tempfile import TemporaryDirectory
 
 from inline_snapshot import snapshot
+from lazy_imports_lite._transformer import pragma_lines
 from lazy_imports_lite._transformer import TransformModuleImports
 from lazy_imports_lite._utils import unparse
 
 
-def check_transform(code, transformed_code, stdout, stderr):
+def check_transform(code, transformed_code, stdout, stderr, **options):
     content = {
         "bar/__init__.py": """
 foo='bar.foo'
@@ -48,7 +49,7 @@ c='bar.foo.c'
 
         test(d / "original", code)
 
-        transformer = TransformModuleImports()
+        transformer = TransformModuleImports(**options)
         tree = ast.parse(code)
         new_tree = ast.fix_missing_locations(transformer.visit(tree))
         new_code = unparse(new_tree)
@@ -75,7 +76,6 @@ if True:
         snapshot(
             """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
 b = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'b')
 d = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'c')
@@ -83,8 +83,8 @@ baz = __lazy_imports_lite__.ImportAs('bar')
 f = __lazy_imports_lite__.ImportAs('bar.foo')
 bar = __lazy_imports_lite__.Import('bar')
 if True:
-    from x import y
-    import z\
+    y = __lazy_imports_lite__.ImportFrom(__package__, 'x', 'y')
+    z = __lazy_imports_lite__.Import('z')\
 """
         ),
         snapshot(""),
@@ -103,9 +103,8 @@ print(a)
         snapshot(
             """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
-print(a._lazy_value)\
+print(__lazy_imports_lite__.lazy_value(a))\
 """
         ),
         snapshot(
@@ -130,11 +129,11 @@ print(f())
         snapshot(
             """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
 
+@__lazy_imports_lite__.track
 def f():
-    return a._lazy_value
+    return __lazy_imports_lite__.lazy_value(a)
 print(f())\
 """
         ),
@@ -160,9 +159,9 @@ print(f())
         snapshot(
             """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
 
+@__lazy_imports_lite__.track
 def f():
     a = 5
     return a
@@ -192,13 +191,13 @@ print(f())
         snapshot(
             """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
 
+@__lazy_imports_lite__.track
 def f():
     global a
-    a._lazy_value = 5
-    return a._lazy_value
+    a = 5
+    return __lazy_imports_lite__.lazy_value(a)
 print(f())\
 """
         ),
@@ -223,9 +222,9 @@ print(f())
         snapshot(
             """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
 
+@__lazy_imports_lite__.track
 def f(a=5):
     return a
 print(f())\
@@ -252,10 +251,10 @@ print(f())
         snapshot(
             """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
 
-def f(b=a._lazy_value):
+@__lazy_imports_lite__.track
+def f(b=__lazy_imports_lite__.lazy_value(a)):
     return b
 print(f())\
 """
@@ -282,9 +281,8 @@ for e in sorted(globals().items()):
         snapshot(
             """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
-for e in sorted(globals().items()):
+for e in sorted(__lazy_imports_lite__.globals().items()):
     if e[0] != '__file__':
         print(*e)\
 """
@@ -318,11 +316,10 @@ print(bar.foo.a)
         snapshot(
             """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 bar = __lazy_imports_lite__.Import('bar')
-print(bar._lazy_value.foo)
+print(__lazy_imports_lite__.lazy_value(bar).foo)
 bar = __lazy_imports_lite__.Import('bar.foo')
-print(bar._lazy_value.foo.a)\
+print(__lazy_imports_lite__.lazy_value(bar).foo.a)\
 """
         ),
         snapshot(
@@ -344,10 +341,9 @@ print(bar.foo.a)
         snapshot(
             """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 bar = __lazy_imports_lite__.Import('bar.foo')
 bar = __lazy_imports_lite__.Import('bar')
-print(bar._lazy_value.foo.a)\
+print(__lazy_imports_lite__.lazy_value(bar).foo.a)\
 """
         ),
         snapshot(
@@ -369,9 +365,8 @@ print(f.a)
         snapshot(
             """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 f = __lazy_imports_lite__.ImportAs('bar.foo')
-print(f._lazy_value.a)\
+print(__lazy_imports_lite__.lazy_value(f).a)\
 """
         ),
         snapshot(
@@ -393,9 +388,8 @@ print((lambda:f.a)())
         snapshot(
             """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 f = __lazy_imports_lite__.ImportAs('bar.foo')
-print((lambda: f._lazy_value.a)())\
+print(__lazy_imports_lite__.track(lambda: __lazy_imports_lite__.lazy_value(f).a)())\
 """
         ),
         snapshot(
@@ -423,13 +417,13 @@ asyncio.run(foo())
         snapshot(
             """\
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 f = __lazy_imports_lite__.ImportAs('bar.foo')
 
+@__lazy_imports_lite__.track
 async def foo():
-    print(f._lazy_value.a)
+    print(__lazy_imports_lite__.lazy_value(f).a)
 asyncio = __lazy_imports_lite__.Import('asyncio')
-asyncio._lazy_value.run(foo())\
+__lazy_imports_lite__.lazy_value(asyncio).run(foo())\
 """
         ),
         snapshot(
@@ -456,9 +450,8 @@ print(f.a)
 """doc string"""
 from __future__ import annotations
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 f = __lazy_imports_lite__.ImportAs('bar.foo')
-print(f._lazy_value.a)\
+print(__lazy_imports_lite__.lazy_value(f).a)\
 '''
         ),
         snapshot(
@@ -470,6 +463,104 @@ bar.foo.a
     )
 
 
+def test_future_annotations():
+    check_transform(
+        """
+from __future__ import annotations
+import sys
+import dataclasses
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from x import y
+
+if sys.version_info >= (3,):
+    from typing import ClassVar
+
+@dataclasses.dataclass
+class C:
+    a: int
+    c: ClassVar[int] = 1
+    b: y = None
+
+def f(a: y, b: sys.version_info = None) -> y:
+    v: y = a
+    return v
+
+print([field.name for field in dataclasses.fields(C)])
+print(f.__annotations__, C.__annotations__)
+""",
+        snapshot(
+            """\
+from __future__ import annotations
+import lazy_imports_lite._hooks as __lazy_imports_lite__
+sys = __lazy_imports_lite__.Import('sys')
+dataclasses = __lazy_imports_lite__.Import('dataclasses')
+TYPE_CHECKING = __lazy_imports_lite__.ImportFrom(__package__, 'typing', 'TYPE_CHECKING')
+if __lazy_imports_lite__.lazy_value(TYPE_CHECKING):
+    y = __lazy_imports_lite__.ImportFrom(__package__, 'x', 'y')
+if __lazy_imports_lite__.lazy_value(sys).version_info >= (3,):
+    ClassVar = __lazy_imports_lite__.ImportFrom(__package__, 'typing', 'ClassVar')
+
+@__lazy_imports_lite__.lazy_value(dataclasses).dataclass
+class C:
+    a: int
+    c: ClassVar[int] = 1
+    b: y = None
+    __lazy_imports_lite__.type_qualifiers('ClassVar', 'y')
+
+@__lazy_imports_lite__.track
+def f(a: y, b: sys.version_info=None) -> y:
+    v: y = a
+    return v
+print([field.name for field in __lazy_imports_lite__.lazy_value(dataclasses).fields(C)])
+print(f.__annotations__, C.__annotations__)\
+"""
+        ),
+        snapshot(
+            """\
+['a', 'b']
+{'a': 'y', 'b': 'sys.version_info', 'return': 'y'} {'a': 'int', 'c': 'ClassVar[int]', 'b': 'y'}
+"""
+        ),
+        snapshot(""),
+    )
+
+
+def test_star_imports():
+    check_transform(
+        """
+import sys
+from bar.foo import *
+
+if sys.version_info >= (3,):
+    from x import *
+
+from lazy_imports_lite import lazy_imports
+
+with lazy_imports():
+    from bar import *
+
+print(a, y, baz)
+""",
+        snapshot(
+            """\
+import lazy_imports_lite._hooks as __lazy_imports_lite__
+sys = __lazy_imports_lite__.Import('sys')
+from bar.foo import *
+if __lazy_imports_lite__.lazy_value(sys).version_info >= (3,):
+    from x import *
+lazy_imports = __lazy_imports_lite__.ImportFrom(__package__, 'lazy_imports_lite', 'lazy_imports')
+with __lazy_imports_lite__.lazy_value(lazy_imports)():
+    from bar import *
+print(a, y, baz)\
+"""
+        ),
+        snapshot("bar.foo.a x.y bar.baz\n"),
+        snapshot(""),
+    )
+
+
 def test_transform_default_argument():
     check_transform(
         """
@@ -487,10 +578,10 @@ foo()
 """doc string"""
 from __future__ import annotations
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 f = __lazy_imports_lite__.ImportAs('bar.foo')
 
-def foo(a=lambda: f._lazy_value.a):
+@__lazy_imports_lite__.track
+def foo(a=__lazy_imports_lite__.track(lambda: __lazy_imports_lite__.lazy_value(f).a)):
     print(a())
 foo()\
 '''
@@ -532,9 +623,9 @@ foo()
 """doc string"""
 from __future__ import annotations
 import lazy_imports_lite._hooks as __lazy_imports_lite__
-globals = __lazy_imports_lite__.make_globals(lambda g=globals: g())
 f = __lazy_imports_lite__.ImportAs('bar.foo')
 
+@__lazy_imports_lite__.track
 def deco(thing):
 
     def w(f):
@@ -542,9 +633,10 @@ def deco(thing):
         return f
     return w
 
-@deco(f._lazy_value)
+@deco(__lazy_imports_lite__.lazy_value(f))
+@__lazy_imports_lite__.track
 def foo():
-    print('in f', f._lazy_value.a)
+    print('in f', __lazy_imports_lite__.lazy_value(f).a)
 print('call')
 foo()\
 '''
@@ -558,3 +650,467 @@ in f bar.foo.a
         ),
         snapshot(""),
     )
+
+
+def test_hoist_loops():
+    check_transform(
+        """
+from bar.foo import a
+from bar.foo import b
+import bar
+
+def f(n):
+    "docstring"
+    print(a)
+    for i in range(n):
+        print(a, b)
+    while n:
+        n -= 1
+        print(bar.baz)
+    return [a for _ in range(2) if b], {k: a for k in bar.baz[:2]}
+
+class C:
+    def m(self):
+        for i in range(2):
+            print(a)
+
+def g():
+    global b
+    for i in range(2):
+        b = a
+        print(b)
+
+print(f(2))
+C().m()
+g()
+""",
+        snapshot(
+            '''\
+import lazy_imports_lite._hooks as __lazy_imports_lite__
+a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
+b = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'b')
+bar = __lazy_imports_lite__.Import('bar')
+
+@__lazy_imports_lite__.track
+def f(n):
+    """docstring"""
+    __lazy_imports_lite_a__ = None
+    __lazy_imports_lite_b__ = None
+    __lazy_imports_lite_bar__ = None
+    print(__lazy_imports_lite__.lazy_value(a))
+    for i in range(n):
+        print(__lazy_imports_lite_a__ if __lazy_imports_lite_a__ is not None else (__lazy_imports_lite_a__ := __lazy_imports_lite__.lazy_value(a)), __lazy_imports_lite_b__ if __lazy_imports_lite_b__ is not None else (__lazy_imports_lite_b__ := __lazy_imports_lite__.lazy_value(b)))
+    while n:
+        n -= 1
+        print((__lazy_imports_lite_bar__ if __lazy_imports_lite_bar__ is not None else (__lazy_imports_lite_bar__ := __lazy_imports_lite__.lazy_value(bar))).baz)
+    return ([__lazy_imports_lite_a__ if __lazy_imports_lite_a__ is not None else (__lazy_imports_lite_a__ := __lazy_imports_lite__.lazy_value(a)) for _ in range(2) if (__lazy_imports_lite_b__ if __lazy_imports_lite_b__ is not None else (__lazy_imports_lite_b__ := __lazy_imports_lite__.lazy_value(b)))], {k: __lazy_imports_lite_a__ if __lazy_imports_lite_a__ is not None else (__lazy_imports_lite_a__ := __lazy_imports_lite__.lazy_value(a)) for k in __lazy_imports_lite__.lazy_value(bar).baz[:2]})
+
+class C:
+
+    @__lazy_imports_lite__.track
+    def m(self):
+        __lazy_imports_lite_a__ = None
+        for i in range(2):
+            print(__lazy_imports_lite_a__ if __lazy_imports_lite_a__ is not None else (__lazy_imports_lite_a__ := __lazy_imports_lite__.lazy_value(a)))
+
+@__lazy_imports_lite__.track
+def g():
+    __lazy_imports_lite_a__ = None
+    global b
+    for i in range(2):
+        b = __lazy_imports_lite_a__ if __lazy_imports_lite_a__ is not None else (__lazy_imports_lite_a__ := __lazy_imports_lite__.lazy_value(a))
+        print(__lazy_imports_lite__.lazy_value(b))
+print(f(2))
+C().m()
+g()\
+'''
+        ),
+        snapshot(
+            """\
+bar.foo.a
+bar.foo.a bar.foo.b
+bar.foo.a bar.foo.b
+bar.baz
+bar.baz
+(['bar.foo.a', 'bar.foo.a'], {'b': 'bar.foo.a', 'a': 'bar.foo.a'})
+bar.foo.a
+bar.foo.a
+bar.foo.a
+bar.foo.a
+"""
+        ),
+        snapshot(""),
+        hoist_loops=True,
+    )
+
+
+def test_hoist_function_imports():
+    check_transform(
+        """
+from bar.foo import a
+
+def f():
+    from bar.foo import b, c as d
+    import bar.foo
+    try:
+        import missing
+    except ImportError as e:
+        print("error:", e)
+    return a, b, d, bar.foo
+
+def g():
+    global x
+    import x
+    class C:
+        import z
+    return C.z.__name__
+
+print(f())
+print(f())
+print(g(), x.y)
+""",
+        snapshot(
+            """\
+import lazy_imports_lite._hooks as __lazy_imports_lite__
+__lazy_imports_lite_0__ = __lazy_imports_lite__.Import('x')
+__lazy_imports_lite_1__ = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'b')
+__lazy_imports_lite_2__ = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'c')
+__lazy_imports_lite_3__ = __lazy_imports_lite__.Import('bar.foo')
+__lazy_imports_lite_4__ = __lazy_imports_lite__.Import('missing')
+a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
+
+@__lazy_imports_lite__.track
+def f():
+    b = __lazy_imports_lite__.local_import(__lazy_imports_lite_1__)
+    d = __lazy_imports_lite__.local_import(__lazy_imports_lite_2__)
+    bar = __lazy_imports_lite__.local_import(__lazy_imports_lite_3__)
+    try:
+        missing = __lazy_imports_lite__.local_import(__lazy_imports_lite_4__)
+    except ImportError as e:
+        print('error:', e)
+    return (__lazy_imports_lite__.lazy_value(a), b, d, bar.foo)
+
+@__lazy_imports_lite__.track
+def g():
+    global x
+    x = __lazy_imports_lite__.local_import(__lazy_imports_lite_0__)
+
+    class C:
+        import z
+    return C.z.__name__
+print(f())
+print(f())
+print(g(), x.y)\
+"""
+        ),
+        snapshot(
+            """\
+error: No module named 'missing'
+('bar.foo.a', 'bar.foo.b', 'bar.foo.c', <module 'bar.foo' from '<dir>/bar/foo.py'>)
+error: No module named 'missing'
+('bar.foo.a', 'bar.foo.b', 'bar.foo.c', <module 'bar.foo' from '<dir>/bar/foo.py'>)
+z x.y
+"""
+        ),
+        snapshot(""),
+        hoist_function_imports=True,
+    )
+
+
+def test_conditional_and_class_imports():
+    check_transform(
+        """
+import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from x import missing
+
+if sys.version_info >= (3,):
+    from bar.foo import a
+else:
+    a = None
+
+if not a:
+    from bar.foo import b
+else:
+    b = "no b"
+    b = b.upper()
+
+class C:
+    from bar.foo import c
+    import bar.foo as f
+    if True:
+        from x import y
+    upper = y.upper()
+    def m(self):
+        return (a, b, self.c)
+
+print(a, b, C.c, C.f.c, C.upper, C().m())
+print("missing" in globals(), TYPE_CHECKING)
+""",
+        snapshot(
+            """\
+import lazy_imports_lite._hooks as __lazy_imports_lite__
+sys = __lazy_imports_lite__.Import('sys')
+TYPE_CHECKING = __lazy_imports_lite__.ImportFrom(__package__, 'typing', 'TYPE_CHECKING')
+if __lazy_imports_lite__.lazy_value(TYPE_CHECKING):
+    missing = __lazy_imports_lite__.ImportFrom(__package__, 'x', 'missing')
+if __lazy_imports_lite__.lazy_value(sys).version_info >= (3,):
+    a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
+else:
+    a = None
+if not __lazy_imports_lite__.lazy_value(a):
+    b = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'b')
+else:
+    b = 'no b'
+    b = __lazy_imports_lite__.lazy_value(b).upper()
+
+class C:
+    c = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'c')
+    f = __lazy_imports_lite__.ImportAs('bar.foo')
+    if True:
+        y = __lazy_imports_lite__.ImportFrom(__package__, 'x', 'y')
+    upper = __lazy_imports_lite__.lazy_value(y).upper()
+
+    @__lazy_imports_lite__.track
+    def m(self):
+        return (__lazy_imports_lite__.lazy_value(a), __lazy_imports_lite__.lazy_value(b), self.c)
+print(__lazy_imports_lite__.lazy_value(a), __lazy_imports_lite__.lazy_value(b), C.c, C.f.c, C.upper, C().m())
+print('missing' in __lazy_imports_lite__.globals(), __lazy_imports_lite__.lazy_value(TYPE_CHECKING))\
+"""
+        ),
+        snapshot(
+            """\
+bar.foo.a NO B bar.foo.c bar.foo.c X.Y ('bar.foo.a', 'NO B', 'bar.foo.c')
+False False
+"""
+        ),
+        snapshot(""),
+    )
+
+
+def test_probe_imports():
+    check_transform(
+        """
+import sys
+
+try:
+    from bar.foo import a
+    import x
+except ImportError:
+    a = "no a"
+else:
+    print("found")
+
+try:
+    import missing_module as y
+except (ImportError, ModuleNotFoundError):
+    from x import y
+
+try:
+    from bar import foo, missing_submodule
+except ImportError:
+    foo = None
+
+try:
+    import missing_module
+except ImportError as e:
+    print(type(e).__name__)
+
+print(a, x.y, y, foo)
+print(sorted(m for m in sys.modules if m in ("bar", "bar.foo", "x")))
+""",
+        snapshot(
+            """\
+import lazy_imports_lite._hooks as __lazy_imports_lite__
+sys = __lazy_imports_lite__.Import('sys')
+if __lazy_imports_lite__.find_imports(__package__, ('bar.foo', 'a'), ('x',)):
+    a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
+    x = __lazy_imports_lite__.Import('x')
+    print('found')
+else:
+    a = 'no a'
+if __lazy_imports_lite__.find_imports(__package__, ('missing_module',)):
+    y = __lazy_imports_lite__.ImportAs('missing_module')
+else:
+    y = __lazy_imports_lite__.ImportFrom(__package__, 'x', 'y')
+if __lazy_imports_lite__.find_imports(__package__, ('bar', 'foo'), ('bar', 'missing_submodule')):
+    foo = __lazy_imports_lite__.ImportFrom(__package__, 'bar', 'foo')
+    missing_submodule = __lazy_imports_lite__.ImportFrom(__package__, 'bar', 'missing_submodule')
+else:
+    foo = None
+try:
+    import missing_module
+except ImportError as e:
+    print(type(e).__name__)
+print(__lazy_imports_lite__.lazy_value(a), __lazy_imports_lite__.lazy_value(x).y, __lazy_imports_lite__.lazy_value(y), __lazy_imports_lite__.lazy_value(foo))
+print(sorted((m for m in __lazy_imports_lite__.lazy_value(sys).modules if m in ('bar', 'bar.foo', 'x'))))\
+"""
+        ),
+        snapshot(
+            """\
+found
+ModuleNotFoundError
+bar.foo.a x.y x.y None
+['bar', 'bar.foo', 'x']
+"""
+        ),
+        snapshot(""),
+        probe_imports=True,
+    )
+
+
+def test_eval_exec():
+    check_transform(
+        """
+from bar.foo import a
+
+def exec(code):
+    print("own exec", code)
+
+def f():
+    return eval("a")
+
+exec("a")
+print(f(), list(map(eval, ["a"])))
+""",
+        snapshot(
+            """\
+import lazy_imports_lite._hooks as __lazy_imports_lite__
+a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
+
+def exec(code):
+    print('own exec', code)
+
+def f():
+    return __lazy_imports_lite__.eval('a')
+exec('a')
+print(f(), list(map(__lazy_imports_lite__.eval, ['a'])))\
+"""
+        ),
+        snapshot(
+            """\
+own exec a
+bar.foo.a ['bar.foo.a']
+"""
+        ),
+        snapshot(""),
+    )
+
+
+def test_import_blocks():
+    check_transform(
+        """
+import lazy_imports_lite
+from lazy_imports_lite import eager_imports, lazy_imports
+
+with eager_imports():
+    from bar.foo import a
+
+with lazy_imports_lite.lazy_imports():
+    from bar.foo import b
+    if True:
+        import x
+
+def f():
+    with lazy_imports():
+        from bar.foo import c
+    return a, b, c, x.y
+
+print(f())
+""",
+        snapshot(
+            """\
+import lazy_imports_lite._hooks as __lazy_imports_lite__
+__lazy_imports_lite_0__ = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'c')
+lazy_imports_lite = __lazy_imports_lite__.Import('lazy_imports_lite')
+eager_imports = __lazy_imports_lite__.ImportFrom(__package__, 'lazy_imports_lite', 'eager_imports')
+lazy_imports = __lazy_imports_lite__.ImportFrom(__package__, 'lazy_imports_lite', 'lazy_imports')
+with __lazy_imports_lite__.lazy_value(eager_imports)():
+    from bar.foo import a
+with __lazy_imports_lite__.lazy_value(lazy_imports_lite).lazy_imports():
+    b = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'b')
+    if True:
+        x = __lazy_imports_lite__.Import('x')
+
+@__lazy_imports_lite__.track
+def f():
+    with __lazy_imports_lite__.lazy_value(lazy_imports)():
+        c = __lazy_imports_lite__.local_import(__lazy_imports_lite_0__)
+    return (a, __lazy_imports_lite__.lazy_value(b), c, __lazy_imports_lite__.lazy_value(x).y)
+print(f())\
+"""
+        ),
+        snapshot("('bar.foo.a', 'bar.foo.b', 'bar.foo.c', 'x.y')\n"),
+        snapshot(""),
+    )
+
+
+def test_eager_configuration():
+    code = """
+from bar.foo import a
+from bar.foo import b  # lazy-imports-lite: eager
+from bar import (  # lazy-imports-lite: eager
+    baz,
+)
+import x
+import z
+
+print(a, b, baz, x.y)
+"""
+    assert pragma_lines(code.encode()) == {3, 4}
+
+    check_transform(
+        code,
+        snapshot(
+            """\
+import lazy_imports_lite._hooks as __lazy_imports_lite__
+a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
+from bar.foo import b
+from bar import baz
+import x
+import z
+print(__lazy_imports_lite__.lazy_value(a), b, baz, x.y)\
+"""
+        ),
+        snapshot("bar.foo.a bar.foo.b bar.baz x.y\n"),
+        snapshot(""),
+        eager_lines=pragma_lines(code.encode()),
+        eager_modules=("x", "z"),
+        package="",
+    )
+
+
+def test_count_lazy_loads():
+    check_transform(
+        """
+from bar.foo import a
+import bar.foo
+
+class C:
+    def m(self):
+        f = lambda: a
+        return a, f(), bar.foo.b
+
+print(C().m(), a)
+""",
+        snapshot(
+            """\
+import lazy_imports_lite._hooks as __lazy_imports_lite__
+a = __lazy_imports_lite__.ImportFrom(__package__, 'bar.foo', 'a')
+bar = __lazy_imports_lite__.Import('bar.foo')
+
+class C:
+
+    @__lazy_imports_lite__.track
+    def m(self):
+        f = lambda: __lazy_imports_lite__.counted_lazy_value(a, __name__, 'C.m.<locals>.<lambda>', 'a')
+        return (__lazy_imports_lite__.counted_lazy_value(a, __name__, 'C.m', 'a'), f(), __lazy_imports_lite__.counted_lazy_value(bar, __name__, 'C.m', 'bar').foo.b)
+print(C().m(), __lazy_imports_lite__.counted_lazy_value(a, __name__, '<module>', 'a'))\
+"""
+        ),
+        snapshot("('bar.foo.a', 'bar.foo.a', 'bar.foo.b') bar.foo.a\n"),
+        snapshot(""),
+        count_lazy_loads=True,
+    )
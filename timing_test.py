@@ -1,6 +1,10 @@
 import timeit
 from collections import namedtuple
 
+from lazy_imports_lite._hooks import ImportFrom
+from lazy_imports_lite._hooks import lazy_value
+from lazy_imports_lite._hooks import local_import as local_import_hook
+
 
 def blub(a):
     pass
@@ -78,6 +82,24 @@ def function_import_param():
     return g4()
 
 
+g6 = ImportFrom(None, "collections", "namedtuple")
+
+
+def hoisted_local_import():
+    # the code of a local import with hoist_function_imports
+    namedtuple = local_import_hook(g6)
+    return namedtuple
+
+
+g7 = namedtuple
+
+
+def hoisted_local_import_resolved():
+    # the code after g7 was resolved (the function uses its plain code)
+    namedtuple = g7
+    return namedtuple
+
+
 def return_none():
     return None
 
@@ -90,6 +112,8 @@ for f in (
     normal_import,
     function_import,
     function_import_param,
+    hoisted_local_import,
+    hoisted_local_import_resolved,
     return_none,
 ):
     results.append((timeit.timeit(f), f.__name__))
@@ -98,3 +122,57 @@ results.sort()
 
 for time, name in results:
     print(f"{name:>25} {time}")
+
+
+# loops which use an imported name in every iteration
+
+g5 = ImportFrom(None, "collections", "namedtuple")
+
+
+def loop_normal_import():
+    for i in range(100):
+        namedtuple
+
+
+def loop_lazy_value():
+    for i in range(100):
+        lazy_value(g5)
+
+
+def loop_hoisted():
+    hidden = None
+    for i in range(100):
+        hidden if hidden is not None else (hidden := lazy_value(g5))
+
+
+def loop_comprehension_normal_import():
+    return [namedtuple for i in range(100)]
+
+
+def loop_comprehension_lazy_value():
+    return [lazy_value(g5) for i in range(100)]
+
+
+def loop_comprehension_hoisted():
+    hidden = None
+    return [
+        hidden if hidden is not None else (hidden := lazy_value(g5)) for i in range(100)
+    ]
+
+
+print()
+results = []
+for f in (
+    loop_normal_import,
+    loop_lazy_value,
+    loop_hoisted,
+    loop_comprehension_normal_import,
+    loop_comprehension_lazy_value,
+    loop_comprehension_hoisted,
+):
+    results.append((timeit.timeit(f, number=100000), f.__name__))
+
+results.sort()
+
+for time, name in results:
+    print(f"{name:>35} {time}")